@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+
+"""
+Script Name: benchmark.py
+
+Description:
+This script times the LLM-driven scripts in this folder (summary.py, inconsistency_finder.py and
+doc_based_chatbot.py) without a real model or GPU. It starts a local stand-in for the Ollama HTTP
+API that answers /api/chat and /api/generate with a configurable latency and token rate, generates
+a synthetic corpus of .txt, .docx, .pdf and .csv files, and runs each script's pipeline stages
+against them, reporting per-stage timings and throughput.
+Because the model's answer time is simulated and known, what remains is the scripts' own overhead:
+extraction, prompt building, health checks, HTTP and I/O. Run it before and after a change to catch
+performance regressions.
+
+Functionality:
+- Mock Ollama server: answers GET / ("Ollama is running"), /api/version and /api/tags, and
+  POST /api/chat, /api/generate (streaming and non-streaming) and /api/embed. Each reply waits
+  --latency seconds before the first token and then emits tokens at --token-rate tokens/s.
+  Replies are shaped for each script: inconsistency checks get 'Consistent'/'Inconsistent'
+  verdicts based on the numbers in the two statements, packed multi-document prompts get
+  delimited per-document summaries, and everything else gets --reply-tokens words of filler.
+- Synthetic corpora: text documents with paragraphs of filler and 'return policy' statements with
+  varying durations (so inconsistency_finder.py has work to do), written as .txt, .docx and .pdf,
+  plus forex trade logs (Date, Pair, Profit) as .csv. Generation is seeded and reproducible.
+- Stages are timed by calling the scripts' own functions in-process:
+  - summary.py: health check, extraction/CSV metrics (prepare_file), summarization
+    (summarize_prepared), writing summary files.
+  - inconsistency_finder.py: extraction (extract_all), topic tagging, deduplication and blocking,
+    the rule-based pre-filter, and the concurrent LLM checks (check_pairs).
+  - doc_based_chatbot.py: reading the documents, chunking and indexing them, retrieving the
+    excerpts for each question, and answering it.
+- For each stage the report shows calls, total seconds, mean milliseconds per call and throughput,
+  followed by the model requests made and the simulated model time they account for.
+- --serve only runs the mock server, e.g. to time the scripts end to end from another terminal.
+
+Arguments:
+- --scripts (optional): Comma-separated scripts to benchmark: summary, inconsistency, chatbot.
+  Default: all three.
+- --files (optional): Number of documents per file type. Default: 10
+- --kinds (optional): Comma-separated file types to generate: txt, docx, pdf, csv. Default: all four.
+- --paragraphs (optional): Paragraphs of filler per text document. Default: 40
+- --csv-rows (optional): Trades per CSV file. Default: 20000
+- --corpus (optional): Directory for the generated corpus; kept after the run. Default: a temporary
+  directory that is removed afterwards.
+- --seed (optional): Random seed for the corpus. Default: 0
+- --latency (optional): Simulated seconds before the first token of each reply. Default: 0.05
+- --token-rate (optional): Simulated tokens per second after the first; 0 emits them instantly.
+  Default: 500
+- --reply-tokens (optional): Length in words of filler replies. Default: 60
+- --host, --port (optional): Address the mock server listens on. Default: 127.0.0.1 11435
+- -w, --workers (optional): Concurrent requests for the stages that support them. Default: 4
+- --questions (optional): Questions asked in the chatbot benchmark. Default: 5
+- --json (optional): Also write the results to this JSON file, e.g. to compare runs.
+- --serve (optional): Only run the mock server until interrupted (Ctrl-C).
+
+Usage:
+Run the script from any directory; it imports the other scripts from its own folder.
+Examples:
+    python benchmark.py                          # Benchmark all three scripts with the defaults
+    python benchmark.py --scripts summary --kinds pdf --files 50   # Time PDF summarization only
+    python benchmark.py --latency 0 --token-rate 0 # Measure pure script overhead
+    python benchmark.py --json before.json       # Save results to compare with a later run
+    python benchmark.py --serve --port 11434 --latency 0.5 # Stand-in Ollama server for manual runs
+    python benchmark.py -h                       # Show help message
+
+Notes:
+- inconsistency_finder.py and doc_based_chatbot.py check for the server at localhost:11434
+  themselves; run them against --serve --port 11434 (with no real Ollama running) to time them
+  end to end. The in-process benchmark does not need that port.
+- LLM stage timings include the simulated model time; with --latency 0 --token-rate 0 they measure
+  only the scripts' own overhead (prompt building, HTTP, parsing).
+
+Python Version:
+- Written for Python 3.12
+- Compatible with Python 3.8 or higher
+- Verify with: python3 --version
+- Install Python: https://www.python.org/downloads/
+
+Required Python Libraries:
+- http.server, threading: Mock Ollama server
+- python-docx: Write the .docx corpus
+- The libraries of the benchmarked scripts (see their own docstrings), e.g. ollama, pdfplumber, pandas
+Install libraries in a virtual environment:
+    python3 -m venv venv
+    source venv/bin/activate  # On macOS/Linux
+    pip install ollama python-docx pdfplumber pandas requests
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FILLER_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore "
+    "et dolore magna aliqua ut enim ad minim veniam quis nostrud exercitation ullamco laboris nisi ut "
+    "aliquip ex ea commodo consequat duis aute irure dolor in reprehenderit in voluptate velit esse"
+).split()
+RETURN_DAYS = [14, 30, 30, 30, 45, 60]
+FOREX_PAIRS = ['EURUSD', 'GBPUSD', 'USDJPY', 'AUDUSD', 'USDCAD', 'EURGBP']
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """Answers the subset of the Ollama HTTP API used by the scripts, with simulated model timing."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/api/version':
+            self._send_json({'version': '0.0.0-mock'})
+        elif self.path == '/api/tags':
+            self._send_json({'models': [{'name': 'llama3.2:latest', 'model': 'llama3.2:latest'}]})
+        else:
+            self._send_body(b"Ollama is running", 'text/plain')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if self.path == '/api/embed':
+            self.server.record_request(0, 0.0)
+            inputs = request.get('input', '')
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._send_json({'model': request.get('model'), 'embeddings': [embed_text(text) for text in inputs]})
+            return
+        if self.path not in ('/api/chat', '/api/generate'):
+            self.send_error(404)
+            return
+
+        if self.path == '/api/chat':
+            prompt = (request.get('messages') or [{}])[-1].get('content', '')
+        else:
+            prompt = request.get('prompt', '')
+        tokens = reply_tokens(prompt, self.server.reply_length)
+        latency, token_delay = self.server.latency, self.server.token_delay
+        self.server.record_request(len(tokens), latency + token_delay * (len(tokens) - 1))
+
+        if not request.get('stream', True):
+            time.sleep(latency + token_delay * (len(tokens) - 1))
+            self._send_json(self._message(request, ''.join(tokens), len(prompt), len(tokens)))
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(latency)
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(token_delay)
+            self._send_chunk(self._message(request, token))
+        self._send_chunk(self._message(request, '', len(prompt), len(tokens)))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _message(self, request, text, prompt_chars=0, eval_count=None):
+        message = {'model': request.get('model'), 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                   'done': eval_count is not None}
+        if self.path == '/api/chat':
+            message['message'] = {'role': 'assistant', 'content': text}
+        else:
+            message['response'] = text
+        if eval_count is not None:
+            eval_ns = int(self.server.token_delay * eval_count * 1e9)
+            message.update(done_reason='stop', prompt_eval_count=prompt_chars // 4 + 1, eval_count=eval_count,
+                           eval_duration=eval_ns, total_duration=int(self.server.latency * 1e9) + eval_ns)
+            if self.path == '/api/generate':
+                message['context'] = [1, 2, 3]
+        return message
+
+    def _send_chunk(self, payload):
+        data = (json.dumps(payload) + '\n').encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, payload):
+        self._send_body(json.dumps(payload).encode('utf-8'), 'application/json')
+
+    def _send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class MockOllamaServer(ThreadingHTTPServer):
+    """Threaded mock server that also counts requests, tokens and simulated model seconds."""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.05, token_rate=500, reply_length=60):
+        super().__init__(address, MockOllamaHandler)
+        self.latency = latency
+        self.token_delay = 1 / token_rate if token_rate > 0 else 0.0
+        self.reply_length = reply_length
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = 0
+            self.tokens = 0
+            self.simulated_s = 0.0
+
+    def record_request(self, tokens, simulated_s):
+        with self.lock:
+            self.requests += 1
+            self.tokens += tokens
+            self.simulated_s += simulated_s
+
+def start_mock_server(host='127.0.0.1', port=11435, latency=0.05, token_rate=500, reply_length=60):
+    """Start a MockOllamaServer in a daemon thread and return it."""
+    server = MockOllamaServer((host, port), latency=latency, token_rate=token_rate, reply_length=reply_length)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def reply_tokens(prompt, length):
+    """The mock reply to a prompt, split into streaming tokens (words with their leading space)."""
+    statements = re.findall(r'^Statement [12]: (.*)$', prompt, re.MULTILINE)
+    packed = re.findall(r'<<<DOC (\d+)>>>', prompt)
+    if len(statements) == 2:
+        numbers = [re.findall(r'\d+', statement) for statement in statements]
+        if sorted(numbers[0]) == sorted(numbers[1]):
+            reply = "Consistent: The statements give the same durations."
+        else:
+            reply = (f"Inconsistent: The durations differ ({', '.join(numbers[0]) or 'none'} days vs. "
+                     f"{', '.join(numbers[1]) or 'none'} days).")
+    elif packed:
+        reply = '\n'.join(f"<<<SUMMARY {doc}>>>\n" + filler(length // len(packed) + 1, doc) for doc in packed)
+    else:
+        reply = filler(length, prompt[:64])
+    words = reply.split(' ')
+    return [words[0]] + [' ' + word for word in words[1:]]
+
+def filler(count, seed):
+    """`count` words of deterministic filler text."""
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(FILLER_WORDS) for _ in range(count)).capitalize() + '.'
+
+def embed_text(text, dimensions=32):
+    """Deterministic bag-of-words embedding, so similar statements get similar vectors."""
+    vector = [0.0] * dimensions
+    for word in re.findall(r'\w+', text.lower()):
+        vector[int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16) % dimensions] += 1.0
+    return vector
+
+def document_paragraphs(rng, paragraphs):
+    """Filler paragraphs with a few 'return policy' statements mentioning varying durations."""
+    result = []
+    for index in range(paragraphs):
+        if index % 10 == 3:
+            result.append(f"Our return policy allows returns within {rng.choice(RETURN_DAYS)} days of delivery.")
+        elif index % 10 == 7:
+            result.append(f"Return policy for electronics: {rng.choice(RETURN_DAYS)} days.")
+        else:
+            result.append(' '.join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(30, 90))).capitalize() + '.')
+    return result
+
+def write_txt(path, paragraphs):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n\n'.join(paragraphs) + '\n')
+
+def write_docx(path, paragraphs):
+    from docx import Document
+    document = Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+def write_pdf(path, paragraphs, lines_per_page=60, line_chars=90):
+    """Write a minimal text PDF (Helvetica, one text object per page) without a PDF library."""
+    lines = []
+    for paragraph in paragraphs:
+        words, line = paragraph.split(), ''
+        for word in words:
+            if line and len(line) + len(word) + 1 > line_chars:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.extend([line, ''])
+    pages = [lines[start:start + lines_per_page] for start in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>']
+    kids = ' '.join(f'{3 + 2 * index} 0 R' for index in range(len(pages)))
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>')
+    font = 3 + 2 * len(pages)
+    for index, page in enumerate(pages):
+        text = ' '.join('(' + re.sub(r'([\\()])', r'\\\1', line) + ') Tj T*' for line in page)
+        stream = f'BT /F1 10 Tf 40 800 Td 12 TL {text} ET'
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents {4 + 2 * index} 0 R '
+                       f'/Resources << /Font << /F1 {font} 0 R >> >> >>')
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+    objects.append('<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    out, offsets = '%PDF-1.4\n', []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n{obj}\nendobj\n'
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n' + ''.join(f'{offset:010d} 00000 n \n' for offset in offsets)
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'
+    with open(path, 'w', encoding='latin-1') as f:
+        f.write(out)
+
+def write_forex_csv(path, rng, rows):
+    start = datetime(2024, 1, 1)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Date', 'Pair', 'Profit'])
+        for row in range(rows):
+            when = start + timedelta(minutes=row * 7)
+            writer.writerow([when.strftime('%Y-%m-%d %H:%M'), rng.choice(FOREX_PAIRS), round(rng.gauss(2, 40), 2)])
+
+DOCUMENT_WRITERS = {'txt': write_txt, 'docx': write_docx, 'pdf': write_pdf}
+
+def make_corpus(directory, files=10, kinds=('txt', 'docx', 'pdf', 'csv'), paragraphs=40, csv_rows=20000, seed=0):
+    """Generate `files` documents of each kind in `directory` and return their paths by kind."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    corpus = {}
+    for kind in kinds:
+        corpus[kind] = []
+        for index in range(files):
+            path = os.path.join(directory, f'doc{index:04d}.{kind}')
+            if kind == 'csv':
+                write_forex_csv(path, rng, csv_rows)
+            else:
+                DOCUMENT_WRITERS[kind](path, document_paragraphs(rng, paragraphs))
+            corpus[kind].append(path)
+    return corpus
+
+class StageTimer:
+    """Accumulates wall-clock time, calls and processed items per named stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name, calls=1, items=None, unit='items'):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'items': 0, 'unit': unit})
+            entry['calls'] += calls
+            entry['seconds'] += time.perf_counter() - start
+            entry['items'] += calls if items is None else items
+
+    def report(self, server):
+        print(f"\n{self.name}")
+        print(f"  {'stage':<24}{'calls':>8}{'total s':>10}{'mean ms':>10}  throughput")
+        for name, entry in self.stages.items():
+            mean_ms = 1000 * entry['seconds'] / entry['calls'] if entry['calls'] else 0.0
+            rate = entry['items'] / entry['seconds'] if entry['seconds'] else 0.0
+            print(f"  {name:<24}{entry['calls']:>8}{entry['seconds']:>10.3f}{mean_ms:>10.1f}  "
+                  f"{rate:,.2f} {entry['unit']}/s")
+        total = sum(entry['seconds'] for entry in self.stages.values())
+        print(f"  Model requests: {server.requests}, tokens: {server.tokens}, simulated model time: "
+              f"{server.simulated_s:.3f}s (summed over concurrent requests); wall total: {total:.3f}s")
+
+    def as_dict(self, server):
+        return {'stages': self.stages, 'model_requests': server.requests, 'model_tokens': server.tokens,
+                'simulated_model_s': server.simulated_s}
+
+def import_script(name):
+    """Import one of the scripts in this folder as a module."""
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    return __import__(name)
+
+def size_mb(paths):
+    return sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+
+def bench_summary(corpus, host, port, workers):
+    """Time summary.py's stages: health check, extraction, summarization and writing."""
+    summary = import_script('summary')
+    summary.configure_ollama(host=host, port=port, concurrency=workers)
+    files = [path for paths in corpus.values() for path in paths]
+    timer = StageTimer(f"summary.py ({len(files)} files, {size_mb(files):.1f} MB)")
+
+    with timer.stage('health check'):
+        if not summary.check_ollama_server():
+            raise RuntimeError("summary.py could not reach the mock server")
+    prepared = {}
+    for kind, paths in corpus.items():
+        with timer.stage(f'extract {kind}', calls=len(paths), items=size_mb(paths), unit='MB'):
+            for path in paths:
+                prepared[path] = summary.prepare_file(path)
+    summaries = {}
+    with timer.stage('summarize', calls=len(files), unit='files'):
+        for path in files:
+            if prepared[path] is not None:
+                summaries[path] = summary.summarize_prepared(prepared[path])
+    # Summaries go to a throwaway directory mirroring the corpus, which keeps one file per
+    # document (doc0000.txt and doc0000.pdf share a stem) and leaves the working directory alone
+    output_dir = tempfile.mkdtemp(prefix='bench_summaries_')
+    layout = summary.SUMMARY_LAYOUT
+    summary.configure_summary_layout(os.path.commonpath([os.path.dirname(path) for path in files]), output_dir)
+    try:
+        with timer.stage('write summaries', calls=len(summaries), unit='files'):
+            for path, text in summaries.items():
+                if text:
+                    summary.write_summary(path, text)
+    finally:
+        summary.SUMMARY_LAYOUT = layout
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return timer
+
+def bench_inconsistency(corpus, workers):
+    """Time inconsistency_finder.py's stages from extraction to the concurrent LLM checks."""
+    finder = import_script('inconsistency_finder')
+    files = sorted(path for kind, paths in corpus.items() if '.' + kind in finder.READERS for path in paths)
+    timer = StageTimer(f"inconsistency_finder.py ({len(files)} files, {size_mb(files):.1f} MB)")
+
+    with timer.stage('extract', calls=len(files), items=size_mb(files), unit='MB'):
+        contents = finder.extract_all(files, workers=workers, cache_path=None)
+    matcher = finder.TopicMatcher(finder.DEFAULT_TOPICS)
+    lines = sum(len(content) for content in contents.values())
+    with timer.stage('tag topics', calls=len(files), items=lines, unit='lines'):
+        file_contents = {}
+        for file, content in contents.items():
+            tagged = [(line, num, matcher.tags(line)) for line, num in content]
+            tagged = [entry for entry in tagged if entry[2]]
+            if tagged:
+                file_contents[file] = tagged
+    with timer.stage('dedupe and block', unit='runs'):
+        statements = finder.collect_statements(file_contents)
+        quantities = {statement.text: finder.extract_quantities(statement.text) for statement in statements}
+        pairs = finder.candidate_pairs(statements, quantities)
+    file_order = {file: position for position, file in enumerate(file_contents)}
+    with timer.stage('prefilter', calls=len(pairs), unit='pairs'):
+        unsettled = [(statements[i], statements[j]) for i, j in pairs
+                     if not finder.prefilter_pair(quantities[statements[i].text], quantities[statements[j].text])]
+    checks = [tuple(occurrence[2] for occurrence in next(finder.occurrence_pairs(first, second, file_order)))
+              for first, second in unsettled]
+    with timer.stage('llm checks', calls=len(checks), unit='pairs'):
+        finder.check_pairs(checks, workers=workers)
+    return timer
+
+def bench_chatbot(corpus, questions):
+    """Time doc_based_chatbot.py's stages: reading, indexing, retrieval and answering questions."""
+    chatbot = import_script('doc_based_chatbot')
+    files = [path for kind, paths in corpus.items() if kind in ('txt', 'docx', 'csv') for path in paths]
+    timer = StageTimer(f"doc_based_chatbot.py ({len(files)} files, {size_mb(files):.1f} MB)")
+
+    with timer.stage('read documents', calls=len(files), items=size_mb(files), unit='MB'):
+        documents = chatbot.load_documents(files)
+    with timer.stage('chunk and index', calls=len(documents), unit='files'):
+        retriever = chatbot.build_retriever(documents)
+    asked = ["What is the return policy for electronics?", "How many days do customers have to return items?",
+             "Which currency pair was traded most?", "What was the net profit?", "Who wrote these documents?"]
+    asked = (asked * (questions // len(asked) + 1))[:questions]
+    contexts = []
+    with timer.stage('retrieve', calls=len(asked), unit='questions'):
+        for question in asked:
+            contexts.append(chatbot.format_chunks(retriever.retrieve(question)))
+    with timer.stage('answer', calls=len(asked), unit='questions'):
+        for question, context in zip(asked, contexts):
+            chatbot.generate_response(question, context)
+    return timer
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM-driven scripts against a mock Ollama server.")
+    parser.add_argument('--scripts', default='summary,inconsistency,chatbot',
+                        help="Comma-separated scripts to benchmark: summary, inconsistency, chatbot.")
+    parser.add_argument('--files', type=int, default=10, help="Documents per file type (default: 10).")
+    parser.add_argument('--kinds', default='txt,docx,pdf,csv', help="File types to generate (default: txt,docx,pdf,csv).")
+    parser.add_argument('--paragraphs', type=int, default=40, help="Paragraphs per text document (default: 40).")
+    parser.add_argument('--csv-rows', type=int, default=20000, help="Trades per CSV file (default: 20000).")
+    parser.add_argument('--corpus', help="Directory for the generated corpus, kept after the run (default: temporary).")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the corpus (default: 0).")
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="Simulated seconds before the first token (default: 0.05).")
+    parser.add_argument('--token-rate', type=float, default=500,
+                        help="Simulated tokens per second; 0 for instant replies (default: 500).")
+    parser.add_argument('--reply-tokens', type=int, default=60, help="Words in filler replies (default: 60).")
+    parser.add_argument('--host', default='127.0.0.1', help="Mock server address (default: 127.0.0.1).")
+    parser.add_argument('--port', type=int, default=11435, help="Mock server port (default: 11435).")
+    parser.add_argument('-w', '--workers', type=int, default=4, help="Concurrent requests where supported (default: 4).")
+    parser.add_argument('--questions', type=int, default=5, help="Questions asked in the chatbot benchmark (default: 5).")
+    parser.add_argument('--json', help="Also write the results to this JSON file.")
+    parser.add_argument('--serve', action='store_true', help="Only run the mock server until interrupted.")
+    args = parser.parse_args()
+
+    scripts = [name.strip() for name in args.scripts.split(',') if name.strip()]
+    unknown = set(scripts) - {'summary', 'inconsistency', 'chatbot'}
+    kinds = [kind.strip().lstrip('.') for kind in args.kinds.split(',') if kind.strip()]
+    unknown_kinds = set(kinds) - {'txt', 'docx', 'pdf', 'csv'}
+    if unknown or unknown_kinds:
+        print(f"Error: unknown scripts or file types: {', '.join(sorted(unknown | unknown_kinds))}")
+        sys.exit(1)
+
+    try:
+        server = start_mock_server(args.host, args.port, args.latency, args.token_rate, args.reply_tokens)
+    except OSError as e:
+        print(f"Error: cannot listen on {args.host}:{args.port}: {e}")
+        sys.exit(1)
+    print(f"Mock Ollama server on http://{args.host}:{args.port} "
+          f"(latency {args.latency}s, {args.token_rate or 'instant'} tokens/s)")
+    if args.serve:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print("\nStopped.")
+        return
+
+    # The ollama package reads OLLAMA_HOST when it is imported, which happens with the first script
+    os.environ['OLLAMA_HOST'] = f"http://{args.host}:{args.port}"
+    corpus_dir = args.corpus or tempfile.mkdtemp(prefix='benchmark_corpus_')
+    results = {}
+    try:
+        start = time.perf_counter()
+        corpus = make_corpus(corpus_dir, files=args.files, kinds=kinds, paragraphs=args.paragraphs,
+                             csv_rows=args.csv_rows, seed=args.seed)
+        print(f"Generated {args.files} x {', '.join(kinds)} in {corpus_dir} ({time.perf_counter() - start:.2f}s)")
+
+        benchmarks = {
+            'summary': lambda: bench_summary(corpus, args.host, args.port, args.workers),
+            'inconsistency': lambda: bench_inconsistency(corpus, args.workers),
+            'chatbot': lambda: bench_chatbot(corpus, args.questions),
+        }
+        for name in scripts:
+            server.reset_stats()
+            try:
+                timer = benchmarks[name]()
+            except ImportError as e:
+                print(f"\nSkipping {name}: {e}")
+                continue
+            timer.report(server)
+            results[name] = timer.as_dict(server)
+    finally:
+        server.shutdown()
+        if not args.corpus:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,51 @@
 #   - ollama: To interact with the locally installed LLaMA 3.2 model
 #   - docx: To read .docx files (python-docx)
 #   - pandas: To read .csv files
+#   - numpy: BM25 and embedding search, and the memory-mapped index (installed with pandas)
+#   - mmap, json, shutil: To write and memory-map index directories
+#   - sqlite3, hashlib: Answer cache
+#   - asyncio, http, urllib.parse, bisect, threading: Server mode and its latency histograms
 #   - sys: To handle command-line arguments
 #   - os: To check file existence and extensions
 #   - subprocess: To check if Ollama server is running
+#   - argparse: To parse command-line options
 # Ollama Version: Latest version compatible with LLaMA 3.2 (e.g., 0.3.12 or higher)
 # Local Model: LLaMA 3.2 (must be installed locally via Ollama)
 #
 # Usage:
 #   - Run the script from the command line with one or more document files (.txt, .docx, .csv) as arguments.
 #   - Example: python3 doc_based_chatbot.py document1.txt document2.docx data.csv
+#   - Options:
+#       --top-k N          Number of document excerpts sent with each question (default: 5).
+#       --chunk-words N    Approximate size of each excerpt in words (default: 200).
+#       --embed-model M    Also rank excerpts by similarity to the question using a local Ollama
+#                          embedding model, e.g. --embed-model nomic-embed-text (ollama pull it first).
+#       --no-retrieval     Send the full content of all documents with every question (original behaviour).
+#       --index DIR        Chat over an index directory built with the index subcommand, instead of files.
+#       --no-tables        Do not answer aggregate questions by computing over the CSV files.
+#       --session          Multi-turn mode: follow-up questions see the conversation so far, and the
+#                          model's evaluated prompt is reused between turns (see Session Mode below).
+#       --history-tokens N Token budget of the remembered conversation in --session mode (default: 2048).
+#       --keep-alive T     How long Ollama keeps the model loaded between turns (default: 30m).
+#       --timing           In --session mode, show the prompt tokens evaluated for each answer.
+#       --cache FILE       SQLite file caching answers across runs (default: ~/.cache/doc_based_chatbot/answers.sqlite3).
+#       --no-cache         Neither read nor write the answer cache.
+#       --cache-similarity S  Also reuse the answer of a cached question whose embedding has cosine
+#                          similarity of at least S (e.g. 0.92) with the new one; needs --embed-model.
+#       --cache-ttl H      Hours after which cached answers expire (default: 168).
+#       --cache-max-entries N  Cached answers kept; the least recently used are evicted (default: 1000).
+#       --serve [HOST:PORT] Answer questions over HTTP instead of the console (default: 127.0.0.1:8080).
+#       --concurrency N    With --serve, questions sent to Ollama at the same time (default: 2).
+#   - Example: python3 doc_based_chatbot.py --top-k 8 --embed-model nomic-embed-text docs/*.docx
+#   - Large or frequently used document sets can be indexed once, then opened instantly:
+#       python3 doc_based_chatbot.py index -o docs.idx docs/*.docx docs/*.csv [--chunk-words N] [--embed-model M]
+#       python3 doc_based_chatbot.py --index docs.idx
+#     The index directory holds the chunk texts as one UTF-8 string table (chunks.bin) with NumPy
+#     offset arrays, source file metadata (meta.json), the BM25 inverted index as NumPy arrays, and
+#     the chunk embeddings (embeddings.npy) when --embed-model is given. All of it is memory-mapped,
+#     not read, when the chat starts, so startup takes well under a second whatever the corpus
+#     size, and several chatbot processes on one machine share the same pages in the OS cache.
+#     Re-run the index subcommand after the documents change.
 #   - The script checks if the Ollama server is running and if the LLaMA 3.2 model is available.
 #   - If the server is not running, it provides instructions to start/install Ollama.
 #   - After reading documents, it opens a chat interface, issues a greeting, and waits for user questions.
@@ -42,12 +78,53 @@
 #   3. Reads and processes document content:
 #      - .txt: Reads raw text.
 #      - .docx: Extracts text from paragraphs.
-#      - .csv: Converts rows to readable text.
-#   4. Combines document content into a single context for the LLaMA model.
+#      - .csv: Converts rows to readable text, column by column and chunk by chunk (fast for
+#        hundreds of thousands of rows).
+#   4. Splits the documents into excerpts of about --chunk-words words and indexes them once (BM25,
+#      plus embeddings with --embed-model).
 #   5. Initializes a chat interface with a greeting.
-#   6. Uses Ollama to generate answers based on document context.
+#   6. For each question, retrieves the --top-k most relevant excerpts, labelled with their source
+#      file names, and uses Ollama to generate an answer from them. The prompt size, and so the
+#      latency of each answer, stays the same however many documents are loaded.
+#      Aggregate questions about CSV data ("how many", "total", "average ...") that name a column or
+#      table are first turned into a small JSON query plan by the model (table, filters, aggregate,
+#      column, group by), which is run with pandas on the CSV files; the model then phrases the
+#      computed result. If no plan fits, the question is answered from the retrieved excerpts as usual.
+#      CSV files are parsed once, while reading the documents; the index keeps their DataFrames.
 #   7. Handles unanswerable questions with a default response.
 #
+# Answer Cache:
+#   - Answers are cached on disk under (document-set fingerprint, normalized question). The question is
+#     normalized by case, whitespace and surrounding punctuation, so "What is the return policy?" and
+#     "what is the return policy" share an entry.
+#   - The fingerprint hashes the path, size and modification time of every source document together with
+#     the model and retrieval settings, and in --index mode the index's build settings. It is recomputed for each question, so editing, adding or removing
+#     a document invalidates the cached answers at once.
+#   - Hit and miss counts and the hit rate are printed on exit. The cache is not used in --session mode,
+#     where answers depend on the conversation.
+#
+# Session Mode:
+#   - Without --session, every question is sent as a new prompt: instructions, document content and question.
+#   - With --session, the first question sends the instructions (and, with --no-retrieval, all documents)
+#     once; Ollama returns the evaluated conversation as a 'context', which is passed back with each
+#     following question along with only that question and its excerpts, and --keep-alive keeps the
+#     model loaded. The document prefix is therefore not re-evaluated, and each follow-up costs only its
+#     own tokens in prefill time.
+#   - Once the remembered turns exceed --history-tokens, the oldest are forgotten and the conversation is
+#     sent again once from the prefix, after which reuse continues.
+#
+# Server Mode:
+#   - With --serve, one process loads the documents (or opens the index) once and answers a whole team:
+#       python3 doc_based_chatbot.py --serve 0.0.0.0:8080 --index docs.idx
+#       curl -N localhost:8080/ask -d '{"question": "What is the return policy?"}'
+#       curl -N 'localhost:8080/ask?q=What+is+the+return+policy'
+#   - Requests are handled with asyncio. Retrieval and table queries run in worker threads, at most
+#     --concurrency questions are sent to Ollama at a time, and the rest wait in line for a slot.
+#   - Answers stream back token by token as chunked plain text. Cached answers are returned at once.
+#   - GET /metrics reports histograms of request latency (by cache or model), queue wait and time to
+#     first token, the number of waiting and active questions, and cache lookups, in the Prometheus
+#     text format. GET /health answers "ok".
+#
 # Error Handling:
 #   - Checks for invalid file extensions or missing files.
 #   - Verifies Ollama server and model availability.
@@ -58,13 +135,66 @@
 #   - Ensure sufficient memory (e.g., 8GB+ RAM) for running LLaMA 3.2 locally.
 #   - Keep the Ollama server running in a separate terminal.
 
+import argparse
+import asyncio
+import bisect
+import hashlib
+import heapq
+import http
+import json
+import math
+import mmap
+import re
+import shutil
+import sqlite3
 import sys
 import os
 import subprocess
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict, namedtuple
 import ollama
 import docx
+import numpy as np
 import pandas as pd
 
+# A piece of a document: source file, 1-based chunk number within that file, and text
+Chunk = namedtuple('Chunk', ['source', 'number', 'text'])
+
+# Rank offset of reciprocal rank fusion; 60 is the usual choice
+RRF_K = 60
+
+# Format version of index directories written by the index subcommand
+INDEX_VERSION = 1
+
+# Location of the persistent answer cache
+DEFAULT_ANSWER_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'doc_based_chatbot', 'answers.sqlite3')
+
+# Instructions that start every prompt
+INSTRUCTIONS = (
+    "You are a chatbot that answers questions based solely on the provided document content. "
+    "Do not use external knowledge. If the question cannot be answered using the document, "
+    "respond with: 'I do not have information for that question.'"
+)
+
+# Questions that may be answered by computing over the CSV tables rather than by reading excerpts.
+# They must also name a column or table (see mentions_table) before a query plan is requested.
+AGGREGATE_QUESTION = re.compile(
+    r"\b(how many|count(ed)?|number of|sum of|total|average|mean|median|max(imum)?|min(imum)?|"
+    r"highest|lowest|largest|smallest|how much)\b", re.IGNORECASE)
+TABLE_AGGREGATES = {'count', 'sum', 'mean', 'median', 'min', 'max', 'nunique'}
+TABLE_QUERY_PROMPT = (
+    "You translate questions about tabular data into a JSON query plan. The tables are:\n\n"
+    "{schemas}\n\n"
+    "Reply with JSON only, in this form:\n"
+    '{{"table": "<table name>", "filters": [{{"column": "<column>", "op": "==|!=|>|>=|<|<=|contains", '
+    '"value": "<value>"}}], "aggregate": "count|sum|mean|median|min|max|nunique", '
+    '"column": "<column, or null to count rows>", "group_by": "<column or null>"}}\n'
+    'If the question cannot be answered by one such aggregate over one table, reply {{"table": null}}.\n\n'
+    "Question: {question}"
+)
+
 def check_ollama_server():
     # Check if Ollama server is running by attempting to list models
     try:
@@ -104,23 +234,37 @@ def read_docx_file(file_path):
         print(f"Error reading {file_path}: {e}")
         return ""
 
-def read_csv_file(file_path):
-    # Read content from a .csv file
+def serialize_rows(df, first_row=1):
+    # Convert DataFrame rows to "Row n: col: value, col: value" lines, one whole column at a time
+    if df.empty:
+        return ""
+    # Missing values print as "nan", as they would in an f-string
+    cells = [f"{col}: " + df[col].astype(str).fillna("nan") for col in df.columns]
+    rows = cells[0].str.cat(cells[1:], sep=", ") if len(cells) > 1 else cells[0]
+    numbers = pd.Series(range(first_row, first_row + len(df)), index=df.index).astype(str)
+    return "\n".join(("Row " + numbers + ": " + rows).tolist())
+
+def read_csv_file(file_path, chunk_rows=100_000, frames=None):
+    # Read content from a .csv file, converting it to text chunk by chunk. With a frames dict,
+    # the DataFrame is also kept there under file_path, so the file is parsed only once.
     try:
-        df = pd.read_csv(file_path)
-        # Convert DataFrame to a readable string
-        content = []
-        for index, row in df.iterrows():
-            row_str = ", ".join([f"{col}: {val}" for col, val in row.items()])
-            content.append(f"Row {index + 1}: {row_str}")
-        return "\n".join(content)
+        content, chunks = [], []
+        first_row = 1
+        for chunk in pd.read_csv(file_path, chunksize=chunk_rows):
+            content.append(serialize_rows(chunk, first_row))
+            first_row += len(chunk)
+            if frames is not None:
+                chunks.append(chunk)
+        if frames is not None and chunks:
+            frames[file_path] = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+        return "\n".join(part for part in content if part)
     except Exception as e:
         print(f"Error reading {file_path}: {e}")
         return ""
 
-def read_documents(file_paths):
-    # Process all provided documents and combine their content
-    content = []
+def iter_documents(file_paths, frames=None):
+    # Read the provided documents one at a time, yielding (file path, text) pairs
+    # (with a frames dict, CSV files are also kept there as DataFrames, see read_csv_file)
     valid_extensions = {'.txt', '.docx', '.csv'}
     
     for file_path in file_paths:
@@ -137,37 +281,937 @@ def read_documents(file_paths):
         elif ext == '.docx':
             text = read_docx_file(file_path)
         elif ext == '.csv':
-            text = read_csv_file(file_path)
+            text = read_csv_file(file_path, frames=frames)
         
         if text:
-            content.append(f"--- Content from {file_path} ---\n{text}")
-    
-    return "\n\n".join(content)
+            yield file_path, text
 
-def generate_response(question, context, model_name='llama3.2'):
-    # Generate a response using Ollama based on document context
-    prompt = (
-        f"You are a chatbot that answers questions based solely on the provided document content. "
-        f"Do not use external knowledge. If the question cannot be answered using the document, "
-        f"respond with: 'I do not have information for that question.'\n\n"
+def load_documents(file_paths, frames=None):
+    # Read all provided documents and return a list of (file path, text) pairs
+    return list(iter_documents(file_paths, frames))
+
+def read_documents(file_paths):
+    # Process all provided documents and combine their content into a single context
+    return "\n\n".join(f"--- Content from {file_path} ---\n{text}" for file_path, text in load_documents(file_paths))
+
+def tokenize(text):
+    # Lowercase word tokens used for BM25 scoring
+    return re.findall(r'\w+', text.lower())
+
+def chunk_document(source, text, chunk_words=200):
+    # Split a document into chunks of about chunk_words words, on line boundaries where possible
+    # (paragraphs of .txt/.docx files, rows of .csv files). Lines longer than a chunk are split by words.
+    chunks = []
+    current, count = [], 0
+    for line in text.splitlines():
+        words = line.split()
+        while len(words) > chunk_words:
+            chunks.append(" ".join(words[:chunk_words]))
+            words = words[chunk_words:]
+        if current and count + len(words) > chunk_words:
+            chunks.append("\n".join(current))
+            current, count = [], 0
+        if words:
+            current.append(" ".join(words))
+            count += len(words)
+    if current:
+        chunks.append("\n".join(current))
+    return [Chunk(source, number + 1, chunk) for number, chunk in enumerate(chunks)]
+
+class BM25Postings:
+    # Accumulates the term frequencies of chunks as they are indexed
+    def __init__(self):
+        self.postings = defaultdict(list)
+        self.lengths = []
+
+    def add(self, text):
+        chunk_id = len(self.lengths)
+        terms = Counter(tokenize(text))
+        self.lengths.append(sum(terms.values()))
+        for term, frequency in terms.items():
+            self.postings[term].append((chunk_id, frequency))
+
+    def build(self):
+        # Return a BM25Index over the chunks added so far
+        # Terms are sorted by their UTF-8 bytes, the order MappedTermTable searches in
+        terms = sorted(self.postings, key=lambda term: term.encode('utf-8'))
+        counts = np.array([len(self.postings[term]) for term in terms], dtype=np.int64)
+        pointers = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=pointers[1:])
+        chunk_ids = np.empty(pointers[-1], dtype=np.int32)
+        frequencies = np.empty(pointers[-1], dtype=np.int32)
+        for index, term in enumerate(terms):
+            postings = self.postings[term]
+            chunk_ids[pointers[index]:pointers[index + 1]] = [chunk_id for chunk_id, _ in postings]
+            frequencies[pointers[index]:pointers[index + 1]] = [frequency for _, frequency in postings]
+        vocabulary = {term: index for index, term in enumerate(terms)}
+        index = BM25Index(vocabulary, pointers, chunk_ids, frequencies, np.array(self.lengths, dtype=np.int32))
+        index.terms = terms
+        return index
+
+class BM25Index:
+    # Okapi BM25 over document chunks. The inverted index is stored in compressed sparse row form:
+    # the postings of term number t are chunk_ids[pointers[t]:pointers[t + 1]], with their frequencies
+    # in the same slice of frequencies. A query only scores the chunks containing one of its terms.
+    # The arrays may be memory-mapped from an index directory (see open_index).
+    def __init__(self, vocabulary, pointers, chunk_ids, frequencies, lengths, k1=1.5, b=0.75):
+        self.vocabulary = vocabulary
+        self.pointers = pointers
+        self.chunk_ids = chunk_ids
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        self.average_length = float(lengths.mean()) if len(lengths) else 0.0
+
+    @classmethod
+    def build(cls, chunks):
+        postings = BM25Postings()
+        for chunk in chunks:
+            postings.add(chunk.text)
+        return postings.build()
+
+    def search(self, query, top_k=5):
+        # Return the top_k (chunk id, score) pairs for the query, best first
+        ids, scores = [], []
+        total = len(self.lengths)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = int(self.pointers[term_id]), int(self.pointers[term_id + 1])
+            chunk_ids = np.asarray(self.chunk_ids[start:end])
+            frequencies = np.asarray(self.frequencies[start:end], dtype=np.float64)
+            idf = math.log(1 + (total - (end - start) + 0.5) / (end - start + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_ids] / self.average_length)
+            ids.append(chunk_ids)
+            scores.append(idf * frequencies * (self.k1 + 1) / (frequencies + norm))
+        if not ids:
+            return []
+        unique_ids, positions = np.unique(np.concatenate(ids), return_inverse=True)
+        totals = np.bincount(positions, weights=np.concatenate(scores))
+        best = top_indices(totals, top_k)
+        return [(int(unique_ids[index]), float(totals[index])) for index in best]
+
+def top_indices(scores, top_k):
+    # Indices of the top_k highest scores, best first
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return []
+    best = np.argpartition(-scores, top_k - 1)[:top_k]
+    return best[np.argsort(-scores[best])]
+
+class EmbeddingIndex:
+    # Cosine-similarity search over unit-normalized chunk embeddings computed with a local
+    # Ollama embedding model. The matrix may be memory-mapped from an index directory.
+    def __init__(self, matrix, model):
+        self.matrix = matrix
+        self.model = model
+
+    @staticmethod
+    def embed(texts, model, batch_size=64):
+        # Return the unit-normalized float32 embeddings of texts, one row each
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(ollama.embed(model=model, input=list(texts[start:start + batch_size]))['embeddings'])
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    @classmethod
+    def build(cls, chunks, model):
+        return cls(cls.embed([chunk.text for chunk in chunks], model), model)
+
+    def search(self, query, top_k=5):
+        # Return the top_k (chunk id, similarity) pairs for the query, best first
+        if not len(self.matrix):
+            return []
+        scores = self.matrix @ self.embed([query], self.model)[0]
+        return [(int(chunk_id), float(scores[chunk_id])) for chunk_id in top_indices(scores, top_k)]
+
+class Retriever:
+    # Selects the chunks most relevant to a question. BM25 is always used; with an embedding index,
+    # BM25 and embedding rankings are merged with reciprocal rank fusion.
+    def __init__(self, chunks, bm25, embeddings=None):
+        self.chunks = chunks
+        self.bm25 = bm25
+        self.embeddings = embeddings
+
+    def retrieve(self, question, top_k=5):
+        rankings = [self.bm25.search(question, top_k * 2)]
+        if self.embeddings:
+            rankings.append(self.embeddings.search(question, top_k * 2))
+        fused = defaultdict(float)
+        for ranking in rankings:
+            for rank, (chunk_id, _) in enumerate(ranking):
+                fused[chunk_id] += 1 / (RRF_K + rank + 1)
+        best = heapq.nlargest(top_k, fused.items(), key=lambda item: item[1])
+        return [self.chunks[chunk_id] for chunk_id, _ in best]
+
+def build_retriever(documents, chunk_words=200, embed_model=None):
+    # Chunk all documents once and index the chunks in memory
+    chunks = [chunk for source, text in documents for chunk in chunk_document(source, text, chunk_words)]
+    embeddings = EmbeddingIndex.build(chunks, embed_model) if embed_model else None
+    return Retriever(chunks, BM25Index.build(chunks), embeddings)
+
+class MappedStrings:
+    # Read-only sequence of strings stored back to back in a memory-mapped UTF-8 file,
+    # string i being blob[offsets[i]:offsets[i + 1]]. Strings are decoded on access only.
+    def __init__(self, path, offsets):
+        self.offsets = offsets
+        with open(path, 'rb') as f:
+            # An empty file cannot be mapped; it only holds empty strings anyway
+            self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b''
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, index):
+        return self.blob[int(self.offsets[index]):int(self.offsets[index + 1])]
+
+    def __getitem__(self, index):
+        return self.raw(index).decode('utf-8')
+
+class MappedTermTable:
+    # BM25 vocabulary backed by MappedStrings sorted by UTF-8 bytes; get() binary-searches it
+    def __init__(self, strings):
+        self.strings = strings
+
+    def get(self, term):
+        key = term.encode('utf-8')
+        low, high = 0, len(self.strings)
+        while low < high:
+            middle = (low + high) // 2
+            if self.strings.raw(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.strings) and self.strings.raw(low) == key:
+            return low
+        return None
+
+class MappedChunks:
+    # Read-only sequence of the Chunks of an index directory, decoded from the string table on access
+    def __init__(self, texts, sources, chunk_sources, chunk_numbers):
+        self.texts = texts
+        self.sources = sources
+        self.chunk_sources = chunk_sources
+        self.chunk_numbers = chunk_numbers
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, index):
+        return Chunk(self.sources[self.chunk_sources[index]], int(self.chunk_numbers[index]), self.texts[index])
+
+def write_index(directory, file_paths, chunk_words=200, embed_model=None):
+    # Chunk and index the documents into an index directory:
+    #   chunks.bin + chunk_offsets.npy     chunk texts as one UTF-8 string table
+    #   chunk_sources.npy, chunk_numbers.npy   source file and chunk number of each chunk
+    #   terms.bin + term_offsets.npy       BM25 vocabulary, sorted by UTF-8 bytes
+    #   postings_*.npy, chunk_lengths.npy  BM25 postings (see BM25Index)
+    #   embeddings.npy                     unit-normalized chunk embeddings (with embed_model)
+    #   tables/<n>.pkl                     DataFrame of source n, for each .csv source
+    #   meta.json                          format version, settings and source files
+    # Documents are read one at a time. The index is written to a temporary directory that
+    # replaces the previous index only once it is complete.
+    temporary = directory.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    postings = BM25Postings()
+    offsets, chunk_sources, chunk_numbers, sources, vectors = [0], [], [], [], []
+    frames = {}
+    with open(os.path.join(temporary, 'chunks.bin'), 'wb') as chunks_file:
+        for file_path, text in iter_documents(file_paths, frames):
+            chunks = chunk_document(file_path, text, chunk_words)
+            stat = os.stat(file_path)
+            sources.append({'path': os.path.abspath(file_path), 'size': stat.st_size,
+                            'mtime_ns': stat.st_mtime_ns, 'chunks': len(chunks)})
+            if file_path in frames:
+                # Keep the parsed CSV so aggregate questions do not parse it again
+                os.makedirs(os.path.join(temporary, 'tables'), exist_ok=True)
+                sources[-1]['table'] = os.path.join('tables', f'{len(sources) - 1}.pkl')
+                frames.pop(file_path).to_pickle(os.path.join(temporary, sources[-1]['table']))
+            for chunk in chunks:
+                data = chunk.text.encode('utf-8')
+                chunks_file.write(data)
+                offsets.append(offsets[-1] + len(data))
+                chunk_sources.append(len(sources) - 1)
+                chunk_numbers.append(chunk.number)
+                postings.add(chunk.text)
+            if embed_model and chunks:
+                vectors.append(EmbeddingIndex.embed([chunk.text for chunk in chunks], embed_model))
+            print(f"Indexed {file_path}: {len(chunks)} chunks")
+    if len(offsets) == 1:
+        shutil.rmtree(temporary)
+        return None
+
+    bm25 = postings.build()
+    term_data = [term.encode('utf-8') for term in bm25.terms]
+    with open(os.path.join(temporary, 'terms.bin'), 'wb') as terms_file:
+        terms_file.write(b''.join(term_data))
+    arrays = {
+        'chunk_offsets': np.array(offsets, dtype=np.int64),
+        'chunk_sources': np.array(chunk_sources, dtype=np.int32),
+        'chunk_numbers': np.array(chunk_numbers, dtype=np.int32),
+        'term_offsets': np.concatenate([[0], np.cumsum([len(data) for data in term_data], dtype=np.int64)]),
+        'postings_pointers': bm25.pointers,
+        'postings_chunks': bm25.chunk_ids,
+        'postings_frequencies': bm25.frequencies,
+        'chunk_lengths': bm25.lengths,
+    }
+    if embed_model:
+        arrays['embeddings'] = np.vstack(vectors)
+    for name, array in arrays.items():
+        np.save(os.path.join(temporary, f'{name}.npy'), array)
+    meta = {'version': INDEX_VERSION, 'chunk_words': chunk_words, 'embed_model': embed_model,
+            'chunks': len(offsets) - 1, 'terms': len(term_data), 'sources': sources}
+    with open(os.path.join(temporary, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+
+    previous = directory.rstrip(os.sep) + '.old'
+    if os.path.exists(directory):
+        shutil.rmtree(previous, ignore_errors=True)
+        os.rename(directory, previous)
+    os.rename(temporary, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+    return meta
+
+def open_index(directory):
+    # Open an index directory written by write_index and return (Retriever, meta).
+    # Every file is memory-mapped rather than read, so opening is immediate whatever the corpus
+    # size, and processes opening the same index share its pages through the OS page cache.
+    with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != INDEX_VERSION:
+        raise ValueError(f"index format version {meta.get('version')} is not supported; rebuild it")
+
+    def load(name):
+        return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+
+    texts = MappedStrings(os.path.join(directory, 'chunks.bin'), load('chunk_offsets'))
+    sources = [source['path'] for source in meta['sources']]
+    chunks = MappedChunks(texts, sources, load('chunk_sources'), load('chunk_numbers'))
+    vocabulary = MappedTermTable(MappedStrings(os.path.join(directory, 'terms.bin'), load('term_offsets')))
+    bm25 = BM25Index(vocabulary, load('postings_pointers'), load('postings_chunks'), load('postings_frequencies'),
+                     load('chunk_lengths'))
+    embeddings = EmbeddingIndex(load('embeddings'), meta['embed_model']) if meta.get('embed_model') else None
+    return Retriever(chunks, bm25, embeddings), meta
+
+def format_chunks(chunks):
+    # Build the prompt context from retrieved chunks, labelled with their source file names
+    return "\n\n".join(f"--- Excerpt {chunk.number} from {chunk.source} ---\n{chunk.text}" for chunk in chunks)
+
+def describe_table(name, df, sample_rows=3):
+    # Short schema description of a table for the query-planning prompt: columns, types and a few rows
+    columns = ", ".join(f"{col} ({dtype})" for col, dtype in df.dtypes.astype(str).items())
+    sample = serialize_rows(df.head(sample_rows))
+    return f"Table {name}: {len(df)} rows. Columns: {columns}\n{sample}"
+
+class TableStore:
+    # The CSV files of the session as pandas DataFrames. Frames already parsed while reading the
+    # documents are passed in `frames`, and frames saved in an index are listed in `saved` as
+    # {csv path: pickle path}; any other CSV is read on the first aggregate question. Each file
+    # is loaded once per process.
+    def __init__(self, file_paths, frames=None, saved=None):
+        self.file_paths = [path for path in file_paths if os.path.splitext(path)[1].lower() == '.csv']
+        self.frames = frames if frames is not None else {}
+        self.saved = saved or {}
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.file_paths)
+
+    @property
+    def tables(self):
+        with self._lock:
+            if self._tables is None:
+                tables = {}
+                for file_path in self.file_paths:
+                    try:
+                        if file_path in self.frames:
+                            df = self.frames[file_path]
+                        elif file_path in self.saved:
+                            df = pd.read_pickle(self.saved[file_path])
+                        else:
+                            df = pd.read_csv(file_path)
+                        tables[os.path.basename(file_path)] = df
+                    except Exception as e:
+                        print(f"Error reading {file_path}: {e}")
+                self._tables = tables
+        return self._tables
+
+def find_column(df, name):
+    # Resolve a column name from a query plan, ignoring case and surrounding whitespace
+    if name is None:
+        return None
+    lower = {str(col).strip().lower(): col for col in df.columns}
+    column = lower.get(str(name).strip().lower())
+    if column is None:
+        raise ValueError(f"unknown column {name!r}")
+    return column
+
+def apply_filter(df, column, op, value):
+    # Rows of df where column <op> value; numbers compare numerically, text case-insensitively
+    series = df[column]
+    if op == 'contains':
+        return df[series.astype(str).str.contains(str(value), case=False, regex=False, na=False)]
+    if pd.api.types.is_numeric_dtype(series):
+        value = float(value)
+    else:
+        series, value = series.astype(str).str.strip().str.lower(), str(value).strip().lower()
+    comparisons = {'==': series.eq, '!=': series.ne, '>': series.gt, '>=': series.ge, '<': series.lt, '<=': series.le}
+    if op not in comparisons:
+        raise ValueError(f"unknown operator {op!r}")
+    return df[comparisons[op](value)]
+
+def run_table_query(plan, tables, max_groups=20):
+    # Execute a query plan produced by plan_table_query with pandas and describe the result in text.
+    # Only the operations listed in TABLE_QUERY_PROMPT are possible; nothing from the plan is evaluated.
+    name = plan.get('table')
+    df = tables.get(name) if name else None
+    if df is None:
+        raise ValueError(f"unknown table {name!r}")
+    steps = []
+    for condition in plan.get('filters') or []:
+        column = find_column(df, condition.get('column'))
+        df = apply_filter(df, column, condition.get('op', '=='), condition.get('value'))
+        steps.append(f"{column} {condition.get('op', '==')} {condition.get('value')}")
+    aggregate = plan.get('aggregate', 'count')
+    if aggregate not in TABLE_AGGREGATES:
+        raise ValueError(f"unknown aggregate {aggregate!r}")
+    column = find_column(df, plan.get('column'))
+    if column is None and aggregate != 'count':
+        raise ValueError(f"aggregate {aggregate!r} needs a column")
+    group_by = find_column(df, plan.get('group_by'))
+
+    target = df[column] if column is not None else df.iloc[:, 0]
+    if aggregate == 'count' and column is None:
+        result = df.groupby(group_by).size() if group_by is not None else len(df)
+    elif group_by is not None:
+        result = target.groupby(df[group_by]).agg(aggregate)
+    else:
+        result = target.agg(aggregate)
+
+    description = f"{aggregate} of {column if column is not None else 'rows'} in {name}"
+    if steps:
+        description += " where " + " and ".join(steps)
+    if isinstance(result, pd.Series):
+        result = result.sort_values(ascending=False)
+        lines = [f"{key}: {value}" for key, value in result.head(max_groups).items()]
+        if len(result) > max_groups:
+            lines.append(f"... and {len(result) - max_groups} more groups")
+        return f"{description}, by {group_by} ({len(result)} groups):\n" + "\n".join(lines)
+    return f"{description} ({len(df)} matching rows): {result}"
+
+def plan_table_query(question, tables, model_name='llama3.2'):
+    # Ask the model to turn an aggregate question into a JSON query plan over the loaded tables.
+    # Returns the plan, or None if the model finds the question is not about the tables.
+    schemas = "\n\n".join(describe_table(name, df) for name, df in tables.items())
+    prompt = TABLE_QUERY_PROMPT.format(schemas=schemas, question=question)
+    response = ollama.generate(model=model_name, prompt=prompt, format='json')
+    plan = json.loads(response['response'])
+    if not isinstance(plan, dict) or not plan.get('table'):
+        return None
+    return plan
+
+def name_words(name):
+    # Lowercase words of a column or table name ('Close_Time' -> ['close', 'time'])
+    return re.findall(r'[a-z0-9]+', str(name).lower())
+
+def mentions_table(question, tables):
+    # True if the question names a table (a word of its file name) or all words of a column name,
+    # allowing a plural 's' ("profits" for Profit)
+    words = set(re.findall(r'[a-z0-9]+', question.lower()))
+    words |= {word[:-1] for word in words if word.endswith('s')}
+    for name, df in tables.items():
+        stem = os.path.splitext(name)[0]
+        if any(len(word) > 2 and word in words for word in name_words(stem)):
+            return True
+        for column in df.columns:
+            column_words = name_words(column)
+            if column_words and all(word in words for word in column_words):
+                return True
+    return False
+
+def answer_from_tables(question, store, model_name='llama3.2'):
+    # Answer an aggregate question by computing it with pandas. Returns the computed result as a
+    # short context for generate_response, or None to fall back to retrieval. Only questions with
+    # aggregate phrasing that name a column or table cost a planning call.
+    if not store or not AGGREGATE_QUESTION.search(question) or not store.tables:
+        return None
+    if not mentions_table(question, store.tables):
+        return None
+    try:
+        plan = plan_table_query(question, store.tables, model_name)
+        if plan is None:
+            return None
+        return "Computed from the CSV data: " + run_table_query(plan, store.tables)
+    except Exception as e:
+        print(f"(Could not compute the answer from the tables: {e}; searching the documents instead.)")
+        return None
+
+def clean_answer(answer):
+    # Replace an empty or generic answer with the standard reply for unanswerable questions
+    answer = answer.strip()
+    if not answer or answer.lower() in ['unknown', 'not provided', 'no information']:
+        return "I do not have information for that question."
+    return answer
+
+def estimate_tokens(text):
+    # Rough token count (about four characters per token), used for the history budget
+    return len(text) // 4 + 1
+
+class ChatSession:
+    # A multi-turn conversation that reuses the model's evaluated prompt between turns.
+    # The first turn sends the stable prefix (instructions, plus all documents when not using
+    # retrieval) and the question; Ollama returns the conversation's context, which is passed back
+    # with the next turn together with only the new text (its excerpts and question), while
+    # keep_alive keeps the model and its KV cache loaded. Follow-up questions therefore only cost
+    # their own tokens in prefill. When the turns exceed history_tokens, the oldest ones are
+    # dropped and the conversation is re-sent once from the prefix with the remaining turns.
+    def __init__(self, prefix, model_name='llama3.2', history_tokens=2048, keep_alive='30m'):
+        self.prefix = prefix
+        self.model_name = model_name
+        self.history_tokens = history_tokens
+        self.keep_alive = keep_alive
+        self.turns = []
+        self.context = None
+        self.last_stats = {}
+
+    def _render(self, turns):
+        return "\n\n".join(f"{turn}\n{answer}" for turn, answer in turns)
+
+    def ask(self, question, excerpts=None):
+        # Answer a question, given the excerpts (or computed results) selected for it, if any
+        turn = f"Question: {question}\n\nAnswer:"
+        if excerpts:
+            turn = f"Document Content:\n{excerpts}\n\n{turn}"
+
+        history = sum(estimate_tokens(text) + estimate_tokens(answer) for text, answer in self.turns)
+        if self.turns and history + estimate_tokens(turn) > self.history_tokens:
+            while self.turns and history + estimate_tokens(turn) > self.history_tokens:
+                text, answer = self.turns.pop(0)
+                history -= estimate_tokens(text) + estimate_tokens(answer)
+            self.context = None
+        if self.context is None:
+            prompt = "\n\n".join(part for part in (self.prefix, self._render(self.turns), turn) if part)
+        else:
+            prompt = "\n\n" + turn
+
+        try:
+            response = ollama.generate(model=self.model_name, prompt=prompt, context=self.context,
+                                       keep_alive=self.keep_alive)
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            return "I do not have information for that question."
+        self.last_stats = {
+            'reused_tokens': len(self.context or ()),
+            'prompt_tokens': response.get('prompt_eval_count') or 0,
+            'prompt_seconds': (response.get('prompt_eval_duration') or 0) / 1e9,
+        }
+        self.context = response.get('context')
+        answer = response['response'].strip()
+        self.turns.append((turn, answer))
+        return clean_answer(answer)
+
+def normalize_question(question):
+    # Cache key form of a question: lowercase, single spaces, no surrounding punctuation
+    return re.sub(r'\s+', ' ', question.lower()).strip().strip('?.!,;: ')
+
+def document_fingerprint(file_paths, settings=''):
+    # Hash of the path, size and modification time of every source file, plus the answer settings.
+    # Changes whenever a document is edited, replaced, added or removed.
+    digest = hashlib.sha256(settings.encode('utf-8'))
+    for file_path in sorted(os.path.abspath(path) for path in file_paths):
+        try:
+            stat = os.stat(file_path)
+            digest.update(f"{file_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+        except OSError:
+            digest.update(f"{file_path}\0missing\n".encode('utf-8'))
+    return digest.hexdigest()
+
+class AnswerCache:
+    # Persistent cache of answers keyed by (document-set fingerprint, normalized question).
+    # With an embedding model and a similarity threshold, a question also matches a cached question
+    # of the same document set whose embedding has at least that cosine similarity. Entries expire
+    # ttl seconds after they were stored, and the least recently used are evicted beyond max_entries.
+    # The fingerprint is recomputed for every lookup, so editing any source document invalidates
+    # the cached answers immediately, even during a running session.
+    def __init__(self, path, file_paths, settings='', ttl=7 * 24 * 3600, max_entries=1000,
+                 embed_model=None, similarity=None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS answers (fingerprint TEXT, question TEXT, answer TEXT, "
+                          "embedding BLOB, created REAL, last_used REAL, PRIMARY KEY (fingerprint, question))")
+        self.file_paths = file_paths
+        self.settings = settings
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embed_model = embed_model if similarity else None
+        self.similarity = similarity
+        self.stats = Counter()
+
+    def embed_question(self, question):
+        # Embedding of a question for similarity lookups, or None without an embedding model or on error.
+        # Callers that hold a lock around get/put compute it beforehand and pass it in.
+        if not self.embed_model:
+            return None
+        try:
+            return EmbeddingIndex.embed([normalize_question(question)], self.embed_model)[0].astype(np.float32)
+        except Exception as e:
+            print(f"(Could not embed the question for the cache: {e})")
+            return None
+
+    def get(self, question, embedding=None):
+        # Return the cached answer to a question, or None
+        fingerprint = document_fingerprint(self.file_paths, self.settings)
+        normalized = normalize_question(question)
+        now = time.time()
+        with self.conn:
+            self.conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+        row = self.conn.execute("SELECT answer FROM answers WHERE fingerprint = ? AND question = ?",
+                                (fingerprint, normalized)).fetchone()
+        kind = 'exact hits'
+        if row is None and self.embed_model:
+            rows = self.conn.execute("SELECT question, answer, embedding FROM answers WHERE fingerprint = ? "
+                                     "AND embedding IS NOT NULL", (fingerprint,)).fetchall()
+            if rows and embedding is None:
+                embedding = self.embed_question(question)
+            if rows and embedding is not None:
+                try:
+                    matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, _, blob in rows])
+                    scores = matrix @ embedding
+                except ValueError as e:
+                    print(f"(Could not compare the question with cached questions: {e})")
+                else:
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity:
+                        normalized, row, kind = rows[best][0], rows[best][1:2], 'similar hits'
+        if row is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats[kind] += 1
+        with self.conn:
+            self.conn.execute("UPDATE answers SET last_used = ? WHERE fingerprint = ? AND question = ?",
+                              (now, fingerprint, normalized))
+        return row[0]
+
+    def put(self, question, answer, embedding=None):
+        # Store an answer, evicting the least recently used entries beyond max_entries
+        fingerprint = document_fingerprint(self.file_paths, self.settings)
+        normalized = normalize_question(question)
+        if embedding is None:
+            embedding = self.embed_question(question)
+        blob = embedding.tobytes() if embedding is not None else None
+        now = time.time()
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                              (fingerprint, normalized, answer, blob, now, now))
+            self.conn.execute("DELETE FROM answers WHERE rowid IN (SELECT rowid FROM answers "
+                              "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def report(self):
+        hits = self.stats['exact hits'] + self.stats['similar hits']
+        total = hits + self.stats['misses']
+        rate = 100 * hits / total if total else 0.0
+        return (f"Answer cache: {self.stats['exact hits']} exact hits, {self.stats['similar hits']} similar hits, "
+                f"{self.stats['misses']} misses (hit rate {rate:.0f}%)")
+
+    def close(self):
+        self.conn.close()
+
+def question_context(question, tables, retriever, documents, top_k=5):
+    # The document content sent with a question: computed table results, the retrieved excerpts,
+    # or, without retrieval, all documents
+    context = answer_from_tables(question, tables)
+    if context is None and retriever:
+        context = format_chunks(retriever.retrieve(question, top_k=top_k))
+    if context is None:
+        context = "\n\n".join(f"--- Content from {file_path} ---\n{text}" for file_path, text in documents)
+    return context
+
+def build_prompt(question, context):
+    # Single-turn prompt: instructions, document content and question
+    return (
+        f"{INSTRUCTIONS}\n\n"
         f"Document Content:\n{context}\n\n"
         f"Question: {question}\n\n"
         f"Answer:"
     )
-    
+
+def generate_response(question, context, model_name='llama3.2'):
+    # Generate a response using Ollama based on document context (all documents, or the
+    # excerpts selected by the retriever)
     try:
-        response = ollama.generate(model=model_name, prompt=prompt)
-        answer = response['response'].strip()
+        response = ollama.generate(model=model_name, prompt=build_prompt(question, context))
         # Check if the response is empty or generic to catch unanswerable questions
-        if not answer or answer.lower() in ['unknown', 'not provided', 'no information']:
-            return "I do not have information for that question."
-        return answer
+        return clean_answer(response['response'])
     except Exception as e:
         print(f"Error generating response: {e}")
         return "I do not have information for that question."
 
+class LatencyHistogram:
+    # Cumulative latency histogram, rendered in the Prometheus text format on /metrics
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+    def __init__(self, name, description, buckets=BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.counts = {}
+
+    def observe(self, seconds, label=None):
+        counts = self.counts.setdefault(label, [0] * (len(self.buckets) + 1) + [0.0])
+        counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        counts[-1] += seconds
+
+    def render(self, label_name='source'):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for label, counts in sorted(self.counts.items(), key=lambda item: str(item[0])):
+            prefix = f'{label_name}="{label}",' if label is not None else ''
+            total = 0
+            for bound, count in zip(list(self.buckets) + ['+Inf'], counts[:-1]):
+                total += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {total}')
+            labels = f'{{{prefix.rstrip(",")}}}' if prefix else ''
+            lines.append(f"{self.name}_sum{labels} {counts[-1]:.6f}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return "\n".join(lines)
+
+class ChatServer:
+    # HTTP service answering questions about one loaded document set for many users at once.
+    # POST /ask with {"question": "..."} (or GET /ask?q=...) streams the answer back as plain text;
+    # GET /metrics reports latency histograms; GET /health answers "ok".
+    # Retrieval and table queries run in worker threads, and at most `concurrency` questions are
+    # sent to Ollama at a time; further questions wait in line for a slot.
+    def __init__(self, find_context, cache=None, concurrency=2, model_name='llama3.2'):
+        self.find_context = find_context
+        self.cache = cache
+        self.concurrency = concurrency
+        self.model_name = model_name
+        self.waiting = 0
+        self.active = 0
+        self.latency = LatencyHistogram('chatbot_request_seconds', "Time from request to the end of the answer.")
+        self.queue_wait = LatencyHistogram('chatbot_queue_wait_seconds', "Time a question waited for an Ollama slot.")
+        self.first_token = LatencyHistogram('chatbot_first_token_seconds',
+                                            "Time from request to the first streamed answer token.")
+
+    async def serve(self, host, port):
+        self.slots = asyncio.Semaphore(self.concurrency)
+        self.cache_lock = asyncio.Lock()
+        self.client = ollama.AsyncClient()
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving on http://{host}:{port}/ask with {self.concurrency} concurrent Ollama requests. "
+              f"Press Ctrl+C to stop.")
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) != 3:
+                return await self.reply(writer, 400, "Malformed request.\n")
+            method, target = request_line[0], urllib.parse.urlsplit(request_line[1])
+            if target.path == '/health':
+                return await self.reply(writer, 200, "ok\n")
+            if target.path == '/metrics':
+                return await self.reply(writer, 200, self.metrics())
+            if target.path != '/ask':
+                return await self.reply(writer, 404, "Not found. Use /ask, /metrics or /health.\n")
+            if method == 'GET':
+                question = urllib.parse.parse_qs(target.query).get('q', [''])[0]
+            elif method == 'POST':
+                length = headers.get('content-length', '0')
+                if not length.isdigit():
+                    return await self.reply(writer, 400, "Invalid Content-Length.\n")
+                length = int(length)
+                if length > 65536:
+                    return await self.reply(writer, 413, "Question too long.\n")
+                body = await reader.readexactly(length)
+                try:
+                    question = json.loads(body)['question'] if body else ''
+                except (ValueError, KeyError, TypeError):
+                    return await self.reply(writer, 400, 'Send JSON of the form {"question": "..."}.\n')
+            else:
+                return await self.reply(writer, 405, "Use GET or POST.\n")
+            if not isinstance(question, str) or not question.strip():
+                return await self.reply(writer, 400, "Please send a question.\n")
+            await self.ask(question.strip(), writer)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # The client went away, or sent a header line longer than the stream limit
+            pass
+        except Exception as e:
+            print(f"Error answering request: {e}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def reply(self, writer, status, text):
+        # Send a complete plain-text response
+        body = text.encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\n"
+                     f"Content-Type: text/plain; charset=utf-8\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1') + body)
+        await writer.drain()
+
+    async def write_chunk(self, writer, text):
+        data = text.encode('utf-8')
+        writer.write(f"{len(data):x}\r\n".encode('latin-1') + data + b"\r\n")
+        await writer.drain()
+
+    async def ask(self, question, writer):
+        # Answer one question, streaming the model's tokens to the client as they arrive
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        embedding = None
+        if self.cache:
+            # The question is embedded (for --cache-similarity) before taking the lock, so slow
+            # embedding calls do not hold up other requests' cache lookups
+            embedding = await loop.run_in_executor(None, self.cache.embed_question, question)
+            async with self.cache_lock:
+                answer = await loop.run_in_executor(None, self.cache.get, question, embedding)
+            if answer is not None:
+                await self.reply(writer, 200, answer + "\n")
+                self.latency.observe(time.perf_counter() - start, 'cache')
+                return
+        
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; charset=utf-8\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        parts = []
+        try:
+            self.queue_wait.observe(time.perf_counter() - start)
+            context = await loop.run_in_executor(None, self.find_context, question)
+            try:
+                stream = await self.client.generate(model=self.model_name, prompt=build_prompt(question, context),
+                                                    stream=True)
+                async for part in stream:
+                    if part['response']:
+                        if not parts:
+                            self.first_token.observe(time.perf_counter() - start)
+                        parts.append(part['response'])
+                        await self.write_chunk(writer, part['response'])
+            except Exception as e:
+                print(f"Error generating response: {e}")
+        finally:
+            self.active -= 1
+            self.slots.release()
+        answer = clean_answer("".join(parts))
+        if not parts:
+            await self.write_chunk(writer, answer)
+        await self.write_chunk(writer, "\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        self.latency.observe(time.perf_counter() - start, 'model')
+        if self.cache and answer != "I do not have information for that question.":
+            async with self.cache_lock:
+                await loop.run_in_executor(None, self.cache.put, question, answer, embedding)
+
+    def metrics(self):
+        lines = [self.latency.render(), self.queue_wait.render(), self.first_token.render(),
+                 "# HELP chatbot_requests_waiting Questions waiting for an Ollama slot.",
+                 "# TYPE chatbot_requests_waiting gauge", f"chatbot_requests_waiting {self.waiting}",
+                 "# HELP chatbot_requests_active Questions being answered by Ollama.",
+                 "# TYPE chatbot_requests_active gauge", f"chatbot_requests_active {self.active}"]
+        if self.cache:
+            stats = self.cache.stats
+            lines += ["# HELP chatbot_cache_lookups_total Answer cache lookups by result.",
+                      "# TYPE chatbot_cache_lookups_total counter"]
+            lines += [f'chatbot_cache_lookups_total{{result="{kind.replace(" ", "_")}"}} {stats[kind]}'
+                      for kind in ('exact hits', 'similar hits', 'misses')]
+        return "\n".join(lines) + "\n"
+
+def index_main(argv):
+    # The index subcommand: chunk and index documents into an index directory for later chat sessions
+    parser = argparse.ArgumentParser(prog='doc_based_chatbot.py index',
+                                     description="Build an on-disk index of documents for doc_based_chatbot.py --index.")
+    parser.add_argument('files', nargs='+', help="Documents to index (.txt, .docx, .csv)")
+    parser.add_argument('-o', '--output', required=True, help="Index directory to write (replaced if it exists)")
+    parser.add_argument('--chunk-words', type=int, default=200, help="Approximate words per excerpt (default: 200)")
+    parser.add_argument('--embed-model', help="Ollama embedding model (e.g. nomic-embed-text) to store embeddings")
+    args = parser.parse_args(argv)
+    
+    start = time.perf_counter()
+    try:
+        meta = write_index(args.output, args.files, chunk_words=args.chunk_words, embed_model=args.embed_model)
+    except Exception as e:
+        print(f"Error building the index: {e}")
+        sys.exit(1)
+    if meta is None:
+        print("No valid content was read from the provided files. Please check the files and try again.")
+        sys.exit(1)
+    print(f"Wrote {args.output}: {meta['chunks']} chunks, {meta['terms']} terms from {len(meta['sources'])} files "
+          f"in {time.perf_counter() - start:.2f}s.")
+
 def main():
     # Main function to run the chatbot
+    if len(sys.argv) > 1 and sys.argv[1] == 'index':
+        index_main(sys.argv[2:])
+        return
+    parser = argparse.ArgumentParser(description="Answer questions about documents using a local Ollama model. "
+                                                 "Use 'doc_based_chatbot.py index -h' to build an index.")
+    parser.add_argument('files', nargs='*', help="Documents to load (.txt, .docx, .csv)")
+    parser.add_argument('--index', help="Index directory built with the index subcommand, instead of files")
+    parser.add_argument('--top-k', type=int, default=5, help="Excerpts sent with each question (default: 5)")
+    parser.add_argument('--chunk-words', type=int, default=200, help="Approximate words per excerpt (default: 200)")
+    parser.add_argument('--embed-model', help="Ollama embedding model (e.g. nomic-embed-text) to combine with BM25")
+    parser.add_argument('--no-retrieval', action='store_true',
+                        help="Send the full content of all documents with every question")
+    parser.add_argument('--no-tables', action='store_true',
+                        help="Do not answer aggregate questions by computing over the CSV files with pandas")
+    parser.add_argument('--session', action='store_true',
+                        help="Multi-turn mode: remember the conversation and reuse the model's context between turns")
+    parser.add_argument('--history-tokens', type=int, default=2048,
+                        help="Token budget of the conversation history in --session mode (default: 2048)")
+    parser.add_argument('--keep-alive', default='30m',
+                        help="How long Ollama keeps the model loaded between turns in --session mode (default: 30m)")
+    parser.add_argument('--timing', action='store_true',
+                        help="In --session mode, show how many prompt tokens were evaluated for each answer")
+    parser.add_argument('--cache', default=DEFAULT_ANSWER_CACHE,
+                        help=f"SQLite file caching answers across runs (default: {DEFAULT_ANSWER_CACHE})")
+    parser.add_argument('--no-cache', action='store_true', help="Neither read nor write the answer cache")
+    parser.add_argument('--cache-similarity', type=float,
+                        help="Reuse the answer of a cached question whose embedding has at least this cosine "
+                             "similarity (e.g. 0.92); needs --embed-model")
+    parser.add_argument('--cache-ttl', type=float, default=7 * 24,
+                        help="Hours after which cached answers expire (default: 168)")
+    parser.add_argument('--cache-max-entries', type=int, default=1000,
+                        help="Cached answers kept; the least recently used are evicted (default: 1000)")
+    parser.add_argument('--serve', nargs='?', const='127.0.0.1:8080', metavar='HOST:PORT',
+                        help="Serve questions over HTTP instead of the console (default address: 127.0.0.1:8080)")
+    parser.add_argument('--concurrency', type=int, default=2,
+                        help="With --serve, questions sent to Ollama at the same time (default: 2)")
+    args = parser.parse_args()
+    if bool(args.files) == bool(args.index):
+        parser.error("give either document files or --index")
+    if args.cache_similarity and not args.embed_model:
+        parser.error("--cache-similarity needs --embed-model")
+    if args.index and args.no_retrieval:
+        parser.error("--no-retrieval needs document files, not --index")
+    if args.serve and args.session:
+        parser.error("--session is per user and cannot be combined with --serve")
+    if args.serve:
+        host, _, port = args.serve.rpartition(':')
+        if not port.isdigit() or args.concurrency < 1:
+            parser.error("--serve takes HOST:PORT and --concurrency must be at least 1")
+    
     # Check if Ollama server is running
     if not check_ollama_server():
         print("Ollama server is not running. Please follow these steps:")
@@ -184,20 +1228,98 @@ def main():
         print("Then restart the script.")
         sys.exit(1)
     
-    # Check command-line arguments
-    if len(sys.argv) < 2:
-        print("Usage: python3 doc_based_chatbot.py <file1> [<file2> ...]")
-        print("Supported file types: .txt, .docx, .csv")
-        sys.exit(1)
+    # Open a pre-built index: nothing is read or parsed until a question needs it
+    retriever = None
+    start = time.perf_counter()
+    if args.index:
+        try:
+            retriever, meta = open_index(args.index)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error opening index {args.index}: {e}")
+            sys.exit(1)
+        print(f"Opened index {args.index}: {len(retriever.chunks)} chunks from {len(meta['sources'])} files "
+              f"in {time.perf_counter() - start:.2f}s.")
     
-    # Read documents
-    file_paths = sys.argv[1:]
-    context = read_documents(file_paths)
+    # Otherwise read documents, keeping parsed CSV files for aggregate questions
+    frames = None if args.no_tables else {}
+    documents = load_documents(args.files, frames) if args.files else []
     
-    if not context:
+    if args.files and not documents:
         print("No valid content was read from the provided files. Please check the files and try again.")
         sys.exit(1)
     
+    # Chunk and index the documents once, so each question only sends its most relevant excerpts
+    if args.files and not args.no_retrieval:
+        try:
+            retriever = build_retriever(documents, chunk_words=args.chunk_words, embed_model=args.embed_model)
+        except Exception as e:
+            print(f"Error building the embedding index with {args.embed_model}: {e}")
+            sys.exit(1)
+        print(f"Indexed {len(retriever.chunks)} chunks from {len(documents)} files "
+              f"in {time.perf_counter() - start:.2f}s.")
+    
+    # CSV files as DataFrames: those parsed above, or those saved in the index
+    if args.no_tables:
+        tables = TableStore([])
+    elif args.index:
+        # Saved frames are used while their CSV file is unchanged since indexing
+        saved = {}
+        for source in meta['sources']:
+            try:
+                stat = os.stat(source['path'])
+            except OSError:
+                continue
+            if source.get('table') and (stat.st_size, stat.st_mtime_ns) == (source['size'], source['mtime_ns']):
+                saved[source['path']] = os.path.join(args.index, source['table'])
+        tables = TableStore([source['path'] for source in meta['sources']], saved=saved)
+    else:
+        tables = TableStore(args.files, frames=frames)
+    
+    # In session mode, the instructions (and all documents, without retrieval) form a prefix that
+    # is evaluated once and then reused through the returned context
+    session = None
+    if args.session:
+        prefix = INSTRUCTIONS
+        if not retriever:
+            full = "\n\n".join(f"--- Content from {file_path} ---\n{text}" for file_path, text in documents)
+            prefix = f"{INSTRUCTIONS}\n\nDocument Content:\n{full}"
+        session = ChatSession(prefix, history_tokens=args.history_tokens, keep_alive=args.keep_alive)
+    
+    # Answers are cached per document set outside session mode, where an answer also depends on the
+    # conversation so far. The model, prompt and retrieval settings are part of the fingerprint.
+    cache = None
+    if not args.no_cache and not args.session:
+        sources = [source['path'] for source in meta['sources']] if args.index else args.files
+        # In --index mode the index's build metadata (chunking, embedding model, sources) is part of
+        # it, so answers from an index rebuilt with other settings are not reused
+        settings = json.dumps(['llama3.2', INSTRUCTIONS, meta if args.index else None, args.top_k,
+                               args.chunk_words, args.embed_model, args.no_retrieval, args.no_tables],
+                              sort_keys=True)
+        try:
+            cache = AnswerCache(args.cache, sources, settings, ttl=args.cache_ttl * 3600,
+                                max_entries=args.cache_max_entries, embed_model=args.embed_model,
+                                similarity=args.cache_similarity)
+        except sqlite3.Error as e:
+            print(f"Answer cache disabled: {e}")
+    
+    # Serve everyone from this process: the documents, index and cache above are shared by all requests
+    if args.serve:
+        server = ChatServer(lambda question: question_context(question, tables, retriever, documents,
+                                                              top_k=args.top_k),
+                            cache=cache, concurrency=args.concurrency)
+        try:
+            asyncio.run(server.serve(host or '127.0.0.1', int(port)))
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            print(f"Error starting the server on {args.serve}: {e}")
+            sys.exit(1)
+        if cache:
+            print(cache.report())
+            cache.close()
+        print("Server stopped.")
+        return
+    
     # Initialize chat interface
     print("\n=== Document-Based Chatbot ===")
     print("Hello! I'm ready to answer questions based on the provided documents.")
@@ -207,15 +1329,39 @@ def main():
     while True:
         question = input("You: ").strip()
         if question.lower() == 'exit':
+            if cache:
+                print(cache.report())
+                cache.close()
             print("Goodbye!")
             break
         if not question:
             print("Please enter a question.")
             continue
         
+        # Reuse a cached answer for the same (or, with --cache-similarity, a similar) question;
+        # the question is embedded once for both the lookup and the store below
+        embedding = cache.embed_question(question) if cache else None
+        response = cache.get(question, embedding) if cache else None
+        if response is not None:
+            print(f"Bot: {response}\n")
+            continue
+        
         # Generate and display response
-        response = generate_response(question, context)
+        if session:
+            context = answer_from_tables(question, tables)
+            if context is None and retriever:
+                context = format_chunks(retriever.retrieve(question, top_k=args.top_k))
+            response = session.ask(question, context)
+        else:
+            response = generate_response(question, question_context(question, tables, retriever, documents,
+                                                                    top_k=args.top_k))
         print(f"Bot: {response}\n")
+        if cache and response != "I do not have information for that question.":
+            cache.put(question, response, embedding)
+        if session and args.timing:
+            stats = session.last_stats
+            print(f"[prompt: {stats['prompt_tokens']} tokens evaluated in {stats['prompt_seconds']:.2f}s, "
+                  f"{stats['reused_tokens']} reused]\n")
 
 if __name__ == '__main__':
     main()
@@ -5,23 +5,85 @@ Script Name: inconsistency_finder.py
 
 Description:
 This script detects inconsistencies in numerical or temporal values (e.g., number of days, quantities) within return policy statements across text documents in the current directory using a locally installed Ollama model.
-It processes files matching a specified wildcard pattern (e.g., '*.txt', '*.docx') and compares pairs of relevant lines (those mentioning 'return policy') to identify discrepancies, such as differing return periods.
+It processes files matching a specified wildcard pattern (e.g., '*.txt', '*.docx') and compares pairs of relevant lines (those mentioning 'return policy', or the topics given with --topic) to identify discrepancies, such as differing return periods.
 Results are printed to the terminal, detailing the files, line numbers, conflicting text, and an explanation of the inconsistency.
+With --output, they are also written to a JSONL or CSV file as they are found.
 
 Functionality:
-- Supports file formats: .txt, .docx.
-- Filters lines explicitly mentioning 'return policy' for comparison.
+- Supports file formats: .txt, .docx, .pdf, .html/.htm.
+- Documents are extracted in parallel worker processes, and the extracted lines are cached on disk
+  keyed by path and validated by modification time and size, so later runs only re-read new or
+  changed files.
+- Filters lines mentioning the audited topics for comparison ('return policy' by default). Topics are
+  chosen with --topic or --keywords-file; all their keywords are compiled into a single regex, so each
+  line is tagged with every topic it mentions in one pass, and statements are compared per topic.
 - Uses Ollama's local LLM to compare numerical/temporal values, ignoring differences in wording or procedural steps.
 - Reports only inconsistencies involving numbers or time (e.g., '30 days' vs. '60 days').
+- Before any LLM call, parses durations, amounts, percentages, dates and counts in each line into
+  normalized (value, unit) quantities, e.g. 'thirty days', '30 days' and '1 month' are all 30 days.
+  Pairs whose lines contain no quantities, or exactly the same quantities, are settled as consistent
+  without the LLM; only the remaining pairs are sent to the model. The run reports how many pairs
+  each stage resolved.
+- Identical statements repeated across files are compared only once, and the verdict is reported
+  for every pair of files they appear in.
+- Blocking: statements are indexed by (topic, kind of quantity), e.g. durations vs. monetary amounts,
+  and only statements sharing a block are compared, so the number of comparisons no longer grows with
+  the square of the number of lines. Statements without any quantity are never compared.
+- Semantic selection (optional, --embed-model): each statement is embedded with a local Ollama
+  embedding model, and among the remaining candidate pairs only each statement's --top-k most
+  similar partners (cosine similarity, brute-force NumPy search) are sent to the LLM, so e.g.
+  electronics returns are not checked against gift-card terms. Embeddings are cached on disk by
+  a hash of the model and statement text.
+- Findings can be streamed to a JSONL or CSV file as each verdict arrives, and completed pairs are
+  recorded in a checkpoint file, so a crashed or interrupted (Ctrl-C) run can be resumed with
+  --resume without re-checking finished pairs. The checkpoint is deleted when a run completes.
+- Pairs are checked concurrently: a bounded number of requests are in flight at once, optionally
+  throttled by a token-bucket rate limit, and transient errors are retried with backoff. The server
+  is health-checked once per run, progress and ETA are shown on stderr, and results are reported in
+  the same order as a sequential run.
+- Verdicts are cached in a local SQLite database keyed by the normalized statement pair (in either
+  order), the model and the prompt version, so re-running after adding a document only asks the
+  model about pairs involving new or changed lines. Cache hits and misses are printed at the end.
 
 Arguments:
 - pattern (required): Wildcard pattern for files to analyze (e.g., '*.txt', '*.docx').
   Example: '*.docx' to process all .docx files.
+- --no-prefilter (optional): Send every pair to the LLM, skipping the rule-based quantity comparison.
+- --no-blocking (optional): Pair every statement with every other, instead of only statements that
+  mention the same kind of quantity.
+- -m, --model (optional): Ollama model to use (default: llama3.2).
+- -w, --workers (optional): Maximum number of requests in flight to Ollama at once (default: 4).
+  Match it to the server's OLLAMA_NUM_PARALLEL for best throughput.
+- --rate (optional): Maximum requests per second sent to Ollama across all workers (default: unlimited).
+- --retries (optional): Retries with exponential backoff when Ollama fails with a connection error,
+  429 or 5xx response (default: 3).
+- --topic (optional, repeatable): Topic to audit, either a phrase used as its own keyword
+  (e.g. 'shipping') or 'name=keyword1,keyword2' (e.g. 'warranty=warranty,guarantee').
+- --keywords-file (optional): File with one topic per line, as 'name: keyword1, keyword2' or a
+  single phrase; lines starting with '#' are ignored. Combined with any --topic values.
+- --cache (optional): SQLite file caching extracted lines and verdicts across runs
+  (default: ~/.cache/inconsistency_finder/cache.sqlite3).
+- --no-cache (optional): Neither read nor write the cache.
+- --embed-model (optional): Ollama embedding model (e.g. nomic-embed-text) enabling semantic selection.
+- --top-k (optional): With --embed-model, number of most similar partners checked per statement (default: 5).
+- -o, --output (optional): File receiving each finding as soon as it is found; CSV if the name ends
+  in .csv, JSONL otherwise. Fields: topic, file1, line1, text1, file2, line2, text2, explanation.
+- --checkpoint (optional): File recording every completed pair and its verdict.
+- --resume (optional): Continue an interrupted run from --checkpoint, appending to --output.
+- --extract-workers (optional): Number of processes extracting documents (default: number of CPUs).
 
 Usage:
 Run the script from the command line in the directory containing the files to analyze.
 Examples:
     python inconsistency_finder.py *.txt       # Analyze all *.txt files
+    python inconsistency_finder.py --no-prefilter *.txt  # Ask the LLM about every pair
+    python inconsistency_finder.py -w 8 --rate 5 *.txt   # 8 concurrent requests, at most 5 per second
+    python inconsistency_finder.py --no-cache *.txt      # Re-ask the model about every pair
+    python inconsistency_finder.py --topic shipping --topic 'refund=refund,money back' *.txt
+    python inconsistency_finder.py --keywords-file topics.txt *.docx  # Audit every topic in topics.txt
+    python inconsistency_finder.py --embed-model nomic-embed-text --top-k 3 *.txt  # Only similar statements
+    python inconsistency_finder.py -o findings.jsonl --checkpoint run.ckpt *.docx  # Stream findings
+    python inconsistency_finder.py -o findings.jsonl --checkpoint run.ckpt --resume *.docx  # Resume it
     python inconsistency_finder.py *.docx      # Analyze all *.docx files
     python inconsistency_finder.py policy*.txt # Analyze files matching policy*.txt
     python inconsistency_finder.py -h          # Show help message
@@ -35,18 +97,25 @@ Python Version:
 Required Python Libraries:
 - ollama: Interface with Ollama's local LLM
 - python-docx: Read .docx files
+- pdfplumber (optional): Read .pdf files
+- beautifulsoup4 (optional): Read .html files
+- numpy (optional): Nearest-neighbour search over embeddings with --embed-model
 - requests: Check Ollama server status
+- httpx: Transport errors raised by the ollama client, retried as transient
 - itertools: Generate combinations for file comparisons
-- re: Regular expression processing for post-processing results
+- concurrent.futures, threading: Concurrent LLM requests and the rate limiter
+- sqlite3, hashlib: Verdict cache
+- csv, json: Findings output and checkpoint files
+- re: Regular expression processing for post-processing results and quantity extraction
 Install libraries in a virtual environment:
     python3 -m venv venv
     source venv/bin/activate  # On macOS/Linux
-    pip install ollama python-docx requests
+    pip install ollama python-docx requests pdfplumber beautifulsoup4
 
 LLM Model:
 - Default model: llama3.2
 - Alternative models: Any Ollama-compatible model (e.g., llama3.1, mistral)
-- Note: The model is hardcoded as 'llama3.2' in the script. To use a different model, modify the 'check_inconsistency' function or add a --model argument.
+- Select a different model with --model, e.g. --model mistral.
 
 Ollama Installation and Setup:
 1. Install Ollama:
@@ -54,6 +123,8 @@ Ollama Installation and Setup:
    - Follow installation instructions for your OS
 2. Pull the model:
     ollama pull llama3.2
+   For semantic selection, also pull an embedding model:
+    ollama pull nomic-embed-text
 3. Start the Ollama server in the background:
     ollama serve > /dev/null 2>&1 &
 4. Verify the server is running:
@@ -67,13 +138,197 @@ Note: The Ollama server must be running before executing the script.
 """
 
 import argparse
+import csv
 import glob
+import hashlib
+import json
 import os
 from docx import Document
 import ollama
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from itertools import combinations
+import httpx
 import requests
 import re
+import sqlite3
+import sys
+import threading
+import time
+
+# A normalized quantity: kind is 'duration' (value in days, or business days), 'amount'
+# (value in a currency), 'percent', 'date' (an ISO-style 'YYYY-MM-DD', 'MM-DD' or 'YYYY-MM'
+# string, or a bare year) or 'count' (value of a counted noun, '' if bare). The value of a
+# range ('30-60 days') is a (low, high) pair.
+Quantity = namedtuple('Quantity', ['kind', 'value', 'unit'])
+
+# A unique (normalized) statement, the set of topics it mentions and every
+# (file, line number, text) it occurs at.
+Statement = namedtuple('Statement', ['text', 'topics', 'occurrences'])
+
+NUMBER_WORDS = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14,
+    'fifteen': 15, 'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19, 'twenty': 20,
+    'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90,
+    'hundred': 100, 'thousand': 1000,
+}
+# Durations are normalized to days; a month counts as 30 days and a year as 365.
+DURATION_UNITS = {'hour': 1 / 24, 'day': 1, 'week': 7, 'fortnight': 14, 'month': 30, 'year': 365}
+CURRENCY_UNITS = {
+    '$': 'USD', 'usd': 'USD', 'dollar': 'USD', '€': 'EUR', 'eur': 'EUR', 'euro': 'EUR',
+    '£': 'GBP', 'gbp': 'GBP', 'pound': 'GBP',
+}
+# Words after a number that are not the counted noun ("2 of", "3 or more").
+COUNT_STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'of', 'to', 'in', 'on', 'at', 'for', 'from', 'by', 'with', 'within',
+    'after', 'before', 'than', 'more', 'less', 'fewer', 'is', 'are', 'was', 'be', 'per',
+}
+
+MONTHS = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6, 'july': 7, 'august': 8,
+    'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'sept': 9,
+    'oct': 10, 'nov': 11, 'dec': 12,
+}
+# Words that make a following four-digit number a year ('since 2024').
+YEAR_PREFIX_RE = re.compile(r'\b(?:in|since|by|until|till|from|before|after|during|of)\s+$', re.IGNORECASE)
+# Suffixes of ordinals ('2nd'), which are positions rather than quantities.
+ORDINAL_SUFFIXES = {'st', 'nd', 'rd', 'th'}
+
+_NUMBER_WORD = r'(?:' + '|'.join(sorted(NUMBER_WORDS, key=len, reverse=True)) + r')'
+_MONTH = r'(?:' + '|'.join(sorted(MONTHS, key=len, reverse=True)) + r')\.?'
+_DAY = r'\d{1,2}(?:st|nd|rd|th)?'
+# Digits only start a number at a word boundary, so 'v2' or 'A4' are not quantities.
+_NUMBER = (
+    r'(?:(?<![\w.])\d+(?:,\d{3})*(?:\.\d+)?'
+    r'|\b' + _NUMBER_WORD + r'(?:(?:[\s-]+|\s+and\s+)' + _NUMBER_WORD + r')*\b)'
+)
+QUANTITY_RE = re.compile(
+    r'(?<![\w.])(?P<date>'
+    r'(?P<iso_year>\d{4})-(?P<iso_month>\d{1,2})-(?P<iso_day>\d{1,2})'
+    r'|(?P<slash_date>\d{1,2}/\d{1,2}/\d{2,4})'
+    # A month word is a date only when capitalized or followed by a year, so 'we may 2 ...' is not
+    r'|(?=(?-i:[A-Z])|' + _MONTH + r'\s+' + _DAY + r',?\s+\d{4}\b)'
+    r'(?P<md_month>' + _MONTH + r')\s+(?P<md_day>' + _DAY + r')\b(?:,?\s+(?P<md_year>\d{4}))?'
+    r'|(?=' + _DAY + r'\s+(?:of\s+)?(?:(?-i:[A-Z])|' + _MONTH + r',?\s+\d{4}\b))'
+    r'(?P<dm_day>' + _DAY + r')\s+(?:of\s+)?(?P<dm_month>' + _MONTH + r')(?:,?\s+(?P<dm_year>\d{4}))?'
+    r'|(?P<my_month>' + _MONTH + r')\s+(?P<my_year>\d{4})'
+    r')(?![\w/-])'
+    r'|(?P<currency>[$€£])\s?(?P<currency_number>' + _NUMBER + r')'
+    r'(?:\s*(?:-|–|to\b)\s*[$€£]?\s?(?P<currency_to>' + _NUMBER + r'))?'
+    r'|\b(?:a|an)\s+(?:single\s+)?(?P<single_unit>hour|day|week|fortnight|month|year)\b'
+    r'|(?P<number>' + _NUMBER + r')(?:\s*(?:-|–|to\b)\s*(?P<number_to>' + _NUMBER + r'))?\s*(?:-\s*)?'
+    r'(?P<unit>%|per\s?cent\b|(?:business|working)\s+days?\b|calendar\s+days?\b'
+    r'|(?:hour|day|week|fortnight|month|year)s?\b|(?:usd|eur|gbp)\b|(?:dollar|euro|pound)s?\b|[a-z]+\b)?',
+    re.IGNORECASE,
+)
+
+def parse_number(text):
+    """Parse '1,000.5' or number words such as 'thirty-five' or 'one hundred and twenty'."""
+    text = text.lower().replace(',', '')
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    total = 0
+    current = 0
+    for word in re.split(r'[\s-]+', text):
+        if word == 'and':
+            continue
+        value = NUMBER_WORDS[word]
+        if value == 100:
+            current = max(current, 1) * 100
+        elif value == 1000:
+            total += max(current, 1) * 1000
+            current = 0
+        else:
+            current += value
+    return float(total + current)
+
+def parse_date(match):
+    """Normalize a QUANTITY_RE date match to 'YYYY-MM-DD', 'MM-DD' or 'YYYY-MM'.
+
+    Slash dates are ambiguous between month/day and day/month orders and are kept as written.
+    """
+    if match.group('iso_year'):
+        return f"{match.group('iso_year')}-{int(match.group('iso_month')):02d}-{int(match.group('iso_day')):02d}"
+    if match.group('slash_date'):
+        return match.group('slash_date')
+    if match.group('my_month'):
+        return f"{match.group('my_year')}-{MONTHS[match.group('my_month').lower().rstrip('.')]:02d}"
+    month = (match.group('md_month') or match.group('dm_month')).lower().rstrip('.')
+    day = int(re.match(r'\d+', match.group('md_day') or match.group('dm_day')).group())
+    year = match.group('md_year') or match.group('dm_year')
+    date = f"{MONTHS[month]:02d}-{day:02d}"
+    return f"{year}-{date}" if year else date
+
+def extract_quantities(line):
+    """Return the normalized quantities mentioned in a line, as a frozenset of Quantity."""
+    quantities = set()
+    for match in QUANTITY_RE.finditer(line):
+        if match.group('date'):
+            quantities.add(Quantity('date', parse_date(match), ''))
+            continue
+        if match.group('currency'):
+            value = parse_number(match.group('currency_number'))
+            if match.group('currency_to'):
+                value = (value, parse_number(match.group('currency_to')))
+            quantities.add(Quantity('amount', value, CURRENCY_UNITS[match.group('currency')]))
+            continue
+        if match.group('single_unit'):
+            unit = match.group('single_unit').lower()
+            quantities.add(Quantity('duration', round(float(DURATION_UNITS[unit]), 6), 'day'))
+            continue
+
+        unit = re.sub(r'\s+', ' ', (match.group('unit') or '').lower())
+        if unit in ORDINAL_SUFFIXES:
+            continue
+        numbers = [match.group('number')] + ([match.group('number_to')] if match.group('number_to') else [])
+        if all(re.fullmatch(r'(?:19|20)\d\d', number) for number in numbers) and (
+                not unit or unit in COUNT_STOPWORDS or YEAR_PREFIX_RE.search(line, 0, match.start())
+                or len(numbers) == 2 and number_quantity(0.0, unit).kind == 'count'):
+            # A bare four-digit number, one such as 'in 2024 we...', or a range of them such as
+            # '2020-2024 policy' is taken to be a year
+            quantities.add(Quantity('date', '/'.join(numbers), ''))
+            continue
+        # A range such as '30-60 days' or 'thirty to sixty days' is one quantity whose value
+        # is the (low, high) pair, both in the shared unit
+        kinds = [number_quantity(parse_number(number), unit) for number in numbers]
+        if len(kinds) == 1:
+            quantities.add(kinds[0])
+        else:
+            quantities.add(kinds[0]._replace(value=(kinds[0].value, kinds[1].value)))
+    return frozenset(quantities)
+
+def number_quantity(value, unit):
+    """The Quantity of a number followed by a (lowercase, possibly empty) unit word."""
+    singular = unit[:-1] if unit.endswith('s') else unit
+    if unit in ('%', 'percent', 'per cent'):
+        return Quantity('percent', value, '%')
+    if unit.startswith(('business', 'working')):
+        return Quantity('duration', value, 'business day')
+    if unit.startswith('calendar'):
+        return Quantity('duration', value, 'day')
+    if singular in DURATION_UNITS:
+        return Quantity('duration', round(value * DURATION_UNITS[singular], 6), 'day')
+    if singular in CURRENCY_UNITS:
+        return Quantity('amount', value, CURRENCY_UNITS[singular])
+    if unit and unit not in COUNT_STOPWORDS:
+        return Quantity('count', value, unit.rstrip('s'))
+    return Quantity('count', value, '')
+
+def prefilter_pair(quantities1, quantities2):
+    """Settle a pair without the LLM when possible.
+
+    Returns 'no quantities' or 'same quantities' when the pair is consistent by rule,
+    or None when the quantities differ and the model has to decide.
+    """
+    if not quantities1 and not quantities2:
+        return 'no quantities'
+    if quantities1 == quantities2:
+        return 'same quantities'
+    return None
 
 def check_ollama_server():
     """Check if the Ollama server is running on the default port (11434)."""
@@ -104,68 +359,615 @@ def read_docx_file(file_path):
         print(f"Error reading {file_path}: {e}")
         return []
 
+def read_pdf_file(file_path):
+    """Read lines from a PDF file, numbered across pages."""
+    try:
+        import pdfplumber
+    except ImportError:
+        print(f"Error reading {file_path}: pdfplumber is not installed (pip install pdfplumber).")
+        return []
+    try:
+        lines = []
+        with pdfplumber.open(file_path) as pdf:
+            for page in pdf.pages:
+                lines.extend((page.extract_text() or '').splitlines())
+                # Page.close() flushes the cached layout objects (pdfplumber >= 0.11).
+                close = getattr(page, 'close', None) or page.flush_cache
+                close()
+        return [(line.strip(), idx + 1) for idx, line in enumerate(lines) if line.strip()]
+    except Exception as e:
+        print(f"Error reading {file_path}: {e}")
+        return []
+
+def read_html_file(file_path):
+    """Read the visible text lines of an HTML file."""
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        print(f"Error reading {file_path}: beautifulsoup4 is not installed (pip install beautifulsoup4).")
+        return []
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            soup = BeautifulSoup(f, 'html.parser')
+        for element in soup(['script', 'style']):
+            element.decompose()
+        lines = soup.get_text('\n').splitlines()
+        return [(line.strip(), idx + 1) for idx, line in enumerate(lines) if line.strip()]
+    except Exception as e:
+        print(f"Error reading {file_path}: {e}")
+        return []
+
+READERS = {
+    '.txt': read_txt_file,
+    '.docx': read_docx_file,
+    '.pdf': read_pdf_file,
+    '.html': read_html_file,
+    '.htm': read_html_file,
+}
+
 def extract_content(file_path):
     """Extract content from a file based on its extension."""
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == '.txt':
-        return read_txt_file(file_path)
-    elif ext == '.docx':
-        return read_docx_file(file_path)
-    else:
+    reader = READERS.get(os.path.splitext(file_path)[1].lower())
+    if reader is None:
         print(f"Unsupported file type: {file_path}")
         return []
+    return reader(file_path)
 
-def is_relevant_line(line):
-    """Check if a line explicitly mentions 'return policy'."""
-    return 'return policy' in line.lower()
+class ExtractionCache:
+    """SQLite cache of extracted (line, line number) lists, keyed by path and validated by mtime and size."""
 
-def check_inconsistency(line1, line2, file1, file2, line_num1, line_num2):
-    """Use Ollama to check if two lines are semantically inconsistent."""
-    if not check_ollama_server():
-        print("Error: Ollama server is not running on port 11434. Start it with 'ollama serve &'.")
-        return "Error"
-    
-    prompt = (
-        f"Compare the numerical or temporal values (e.g., number of days, quantities, amounts) in the following two statements. "
-        f"Return 'Inconsistent' if the numerical or temporal values differ (e.g., different number of days), along with a brief explanation identifying the specific difference. "
-        f"Ignore differences in wording, procedural steps (e.g., contacting support, packaging requirements), or unrelated conditions. "
-        f"Return 'Consistent' if the statements have no numerical or temporal differences or are unrelated:\n"
-        f"Statement 1: {line1}\n"
-        f"Statement 2: {line2}\n"
-        f"Example: If one statement says '30 days' and another says '60 days,' return 'Inconsistent: The durations differ (30 days vs. 60 days).'"
-    )
-    try:
-        response = ollama.chat(model='llama3.2', messages=[
-            {'role': 'user', 'content': prompt}
-        ])
-        result = response['message']['content'].strip()
-        # Post-process to ensure only numerical/temporal inconsistencies are flagged
-        if "Inconsistent" in result:
-            if not re.search(r'\b(days|duration|quantit|amount)\b', result.lower()):
-                result = "Consistent: Post-processed to ignore non-numerical/temporal inconsistency."
-        return result
-    except Exception as e:
-        print(f"Error with Ollama model: {e}")
-        return "Error"
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS extracted "
+                          "(path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, lines TEXT NOT NULL)")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path, stat):
+        row = self.conn.execute("SELECT lines FROM extracted WHERE path = ? AND mtime_ns = ? AND size = ?",
+                                (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)).fetchone()
+        if row:
+            self.hits += 1
+            return [tuple(entry) for entry in json.loads(row[0])]
+        self.misses += 1
+        return None
+
+    def put_many(self, entries):
+        """Store (file path, stat, lines) entries in a single transaction."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO extracted (path, mtime_ns, size, lines) VALUES (?, ?, ?, ?)",
+                [(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, json.dumps(lines))
+                 for file_path, stat, lines in entries])
+
+    def close(self):
+        self.conn.close()
+
+def extract_all(files, workers=None, cache_path=None):
+    """Extract the lines of every file, in order, reusing cached extractions of unchanged files.
+
+    Files missing from the cache (or modified since) are parsed in a pool of `workers`
+    processes; with a single file to parse, or workers=1, it is done in this process.
+    """
+    supported = []
+    for file in files:
+        if os.path.splitext(file)[1].lower() in READERS:
+            supported.append(file)
+        else:
+            print(f"Unsupported file type: {file}")
+
+    cache = ExtractionCache(cache_path) if cache_path else None
+    stats = {file: os.stat(file) for file in supported}
+    contents = {file: cache.get(file, stats[file]) if cache else None for file in supported}
+    misses = [file for file in supported if contents[file] is None]
+
+    if len(misses) > 1 and (workers is None or workers > 1):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            extracted = list(pool.map(extract_content, misses, chunksize=max(1, len(misses) // 64)))
+    else:
+        extracted = [extract_content(file) for file in misses]
+    for file, lines in zip(misses, extracted):
+        contents[file] = lines
+
+    if cache:
+        # Empty results may be read errors, so they are retried next run rather than cached
+        cache.put_many([(file, stats[file], contents[file]) for file in misses if contents[file]])
+        cache.close()
+        print(f"Extraction cache: {cache.hits} hits, {cache.misses} misses")
+    return contents
+
+DEFAULT_TOPICS = {'return policy': ['return policy']}
+
+class TopicMatcher:
+    """Tags lines with every topic whose keywords they mention.
+
+    All keywords of all topics are compiled into one case-insensitive regex, so a line is
+    scanned once however many topics are configured. Keywords match whole words, tolerate
+    any whitespace between their words, and may overlap (e.g. 'return policy' and 'policy').
+    The regex reports the longest keyword at each position; shorter keywords that start at
+    the same position are word prefixes of it ('return' of 'return policy'), and are looked
+    up in a table built with the pattern.
+
+    >>> matcher = TopicMatcher({'returns': ['return'], 'return policy': ['return policy'],
+    ...                         'policy': ['policy'], 'refunds': ['refund']})
+    >>> matcher.tags('Our Return  policy allows 30 days')
+    ['returns', 'return policy', 'policy']
+    >>> matcher.tags('No refunds after returning items')
+    []
+    """
+
+    def __init__(self, topics):
+        self.topics = list(topics)
+        self.keyword_topics = defaultdict(list)
+        for topic, keywords in topics.items():
+            for keyword in keywords:
+                key = ' '.join(keyword.lower().split())
+                if key and topic not in self.keyword_topics[key]:
+                    self.keyword_topics[key].append(topic)
+        # Topics of each keyword together with those of its shorter keywords that end at a word
+        # boundary inside it, which match wherever it does
+        self.match_topics = {}
+        for keyword, keyword_topics in self.keyword_topics.items():
+            found = list(keyword_topics)
+            for other, other_topics in self.keyword_topics.items():
+                if len(other) < len(keyword) and keyword.startswith(other) and not (
+                        keyword[len(other)].isalnum() or keyword[len(other)] == '_'):
+                    found.extend(other_topics)
+            self.match_topics[keyword] = found
+        alternatives = '|'.join(re.escape(keyword).replace(r'\ ', r'\s+')
+                                for keyword in sorted(self.keyword_topics, key=len, reverse=True))
+        # A zero-width lookahead lets finditer report matches that overlap an earlier one
+        self.pattern = re.compile(r'(?<!\w)(?=(' + alternatives + r')(?!\w))', re.IGNORECASE)
+
+    def tags(self, line):
+        """Topics mentioned in a line, in configured order (empty if the line is not relevant)."""
+        found = set()
+        for match in self.pattern.finditer(line):
+            found.update(self.match_topics[' '.join(match.group(1).lower().split())])
+        return [topic for topic in self.topics if topic in found]
+
+def load_topics(topic_args=(), keywords_file=None):
+    """Build the topic -> keywords mapping from --topic values and a keywords file.
+
+    A --topic value is either a phrase, which is its own keyword ('shipping'), or
+    'name=keyword1,keyword2'. Keywords files hold one topic per line in the same form, or
+    'name: keyword1, keyword2'; blank lines and lines starting with '#' are ignored.
+    Without either option, DEFAULT_TOPICS is used.
+    """
+    entries = list(topic_args)
+    if keywords_file:
+        with open(keywords_file, 'r', encoding='utf-8') as f:
+            entries.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith('#'))
+    topics = {}
+    for entry in entries:
+        name, sep, keywords = entry.partition('=') if '=' in entry else entry.partition(':')
+        name = name.strip()
+        keywords = [keyword.strip() for keyword in keywords.split(',')] if sep else [name]
+        topics.setdefault(name, []).extend(keyword for keyword in keywords if keyword)
+    return topics or DEFAULT_TOPICS
+
+PROMPT = (
+    "Compare the numerical or temporal values (e.g., number of days, quantities, amounts) in the following two statements. "
+    "Return 'Inconsistent' if the numerical or temporal values differ (e.g., different number of days), along with a brief explanation identifying the specific difference. "
+    "Ignore differences in wording, procedural steps (e.g., contacting support, packaging requirements), or unrelated conditions. "
+    "Return 'Consistent' if the statements have no numerical or temporal differences or are unrelated:\n"
+    "Statement 1: {line1}\n"
+    "Statement 2: {line2}\n"
+    "Example: If one statement says '30 days' and another says '60 days,' return 'Inconsistent: The durations differ (30 days vs. 60 days).'"
+)
+# Bump whenever PROMPT or the post-processing in check_inconsistency changes, so cached verdicts are not reused.
+PROMPT_VERSION = 1
+
+DEFAULT_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'inconsistency_finder', 'cache.sqlite3')
+
+class VerdictCache:
+    """SQLite cache of LLM verdicts for statement pairs, shared across runs.
+
+    Keys are order-independent: the pair (a, b) and (b, a) hash the same, after normalizing
+    both statements, together with the model and PROMPT_VERSION.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict TEXT NOT NULL)")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(line1, line2, model):
+        statements = sorted((normalize_statement(line1), normalize_statement(line2)))
+        payload = json.dumps([statements, model, PROMPT_VERSION])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, line1, line2, model):
+        row = self.conn.execute("SELECT verdict FROM verdicts WHERE key = ?",
+                                (self.key(line1, line2, model),)).fetchone()
+        if row:
+            self.hits += 1
+            return row[0]
+        self.misses += 1
+        return None
+
+    def put_many(self, entries, model):
+        """Store (line1, line2, verdict) entries in a single transaction."""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO verdicts (key, verdict) VALUES (?, ?)",
+                                  [(self.key(line1, line2, model), verdict) for line1, line2, verdict in entries])
+
+    def close(self):
+        self.conn.close()
+
+class EmbeddingCache:
+    """SQLite cache of statement embeddings, keyed by a hash of the embedding model and normalized text."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    @staticmethod
+    def key(text, model):
+        return hashlib.sha256(f"{model}\0{normalize_statement(text)}".encode('utf-8')).hexdigest()
 
-def find_inconsistencies(file_pattern):
-    """Find inconsistencies across files matching the pattern."""
+    def get(self, text, model):
+        row = self.conn.execute("SELECT vector FROM embeddings WHERE key = ?", (self.key(text, model),)).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, entries, model):
+        """Store (text, float32 vector bytes) entries in a single transaction."""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                                  [(self.key(text, model), vector) for text, vector in entries])
+
+    def close(self):
+        self.conn.close()
+
+def embed_statements(texts, model, cache_path=None, batch_size=64):
+    """Return a unit-normalized float32 embedding matrix, one row per text.
+
+    Embeddings are read from the cache when present; the rest are computed with the
+    Ollama embedding model in batches of `batch_size` and added to the cache.
+    """
+    import numpy as np
+
+    cache = EmbeddingCache(cache_path) if cache_path else None
+    vectors = [cache.get(text, model) if cache else None for text in texts]
+    vectors = [np.frombuffer(vector, dtype=np.float32) if vector is not None else None for vector in vectors]
+    missing = [index for index, vector in enumerate(vectors) if vector is None]
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        response = ollama.embed(model=model, input=[texts[index] for index in batch])
+        for index, embedding in zip(batch, response['embeddings']):
+            vectors[index] = np.asarray(embedding, dtype=np.float32)
+    if cache:
+        cache.put_many([(texts[index], vectors[index].tobytes()) for index in missing], model)
+        cache.close()
+    print(f"Embeddings: {len(texts) - len(missing)} cached, {len(missing)} computed with {model}")
+
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def nearest_pairs(pairs, embeddings, top_k):
+    """Keep only the candidate pairs among each statement's `top_k` most similar partners.
+
+    A brute-force nearest-neighbour search restricted to the candidate pairs: cosine
+    similarities are computed for every pair at once, then ranked per statement. A pair is
+    kept if either statement has the other among its top_k candidates.
+    """
+    import numpy as np
+
+    if not pairs:
+        return []
+    first, second = np.array(pairs).T
+    similarity = np.einsum('ij,ij->i', embeddings[first], embeddings[second])
+    # Rank each pair from both ends: statement, then descending similarity
+    nodes = np.concatenate([first, second])
+    pair_ids = np.concatenate([np.arange(len(pairs))] * 2)
+    order = np.lexsort((-np.concatenate([similarity, similarity]), nodes))
+    sorted_nodes = nodes[order]
+    group_start = np.searchsorted(sorted_nodes, sorted_nodes, side='left')
+    rank = np.arange(len(order)) - group_start
+    keep = np.unique(pair_ids[order][rank < top_k])
+    return [pairs[index] for index in keep]
+
+def is_transient_error(error):
+    """Whether an Ollama call failing with this error is worth retrying."""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError))
+
+class TokenBucket:
+    """Thread-safe token-bucket rate limiter: at most `rate` calls per second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class Progress:
+    """Single-line progress and ETA display on stderr, updated as pairs complete."""
+
+    def __init__(self, total, label="Checking pairs"):
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.errors = 0
+        self.start = time.monotonic()
+        self.enabled = total > 0 and sys.stderr.isatty()
+
+    def update(self, failed=False):
+        self.done += 1
+        self.errors += failed
+        if not self.enabled:
+            return
+        elapsed = time.monotonic() - self.start
+        eta = elapsed / self.done * (self.total - self.done)
+        errors = f", {self.errors} failed" if self.errors else ""
+        print(f"\r{self.label}: {self.done}/{self.total} ({100 * self.done / self.total:.0f}%), "
+              f"elapsed {elapsed:.0f}s, ETA {eta:.0f}s{errors}   ", end='', file=sys.stderr, flush=True)
+
+    def close(self):
+        if self.enabled:
+            print(file=sys.stderr)
+
+def check_inconsistency(line1, line2, model='llama3.2', limiter=None, retries=3, backoff=1.0):
+    """Use Ollama to check if two lines are semantically inconsistent.
+
+    Transient failures (connection errors, 429 and 5xx responses) are retried up to `retries`
+    times with exponential backoff; each attempt first takes a token from `limiter`, if given.
+    """
+    prompt = PROMPT.format(line1=line1, line2=line2)
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            response = ollama.chat(model=model, messages=[
+                {'role': 'user', 'content': prompt}
+            ])
+            break
+        except Exception as e:
+            if attempt < retries and is_transient_error(e):
+                time.sleep(backoff * 2 ** attempt)
+                continue
+            print(f"\nError with Ollama model: {e}")
+            return "Error"
+    result = response['message']['content'].strip()
+    # Post-process to ensure only numerical/temporal inconsistencies are flagged
+    if "Inconsistent" in result:
+        if not re.search(r'\b(days|duration|quantit|amount)\b', result.lower()):
+            result = "Consistent: Post-processed to ignore non-numerical/temporal inconsistency."
+    return result
+
+def check_pairs(pairs, model='llama3.2', workers=4, rate=0, retries=3, on_result=None):
+    """Check (line1, line2) pairs concurrently and return the verdicts in the order of `pairs`.
+
+    At most `workers` requests are in flight at once; with `rate` > 0 no more than `rate`
+    requests per second are started, across all workers. `on_result(index, verdict)` is
+    called in the calling thread as each pair completes, in completion order. On
+    KeyboardInterrupt, pairs not yet started are cancelled before the interrupt propagates.
+    """
+    limiter = TokenBucket(rate, burst=workers) if rate > 0 else None
+    results = [None] * len(pairs)
+    progress = Progress(len(pairs))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(check_inconsistency, line1, line2, model, limiter, retries): index
+            for index, (line1, line2) in enumerate(pairs)
+        }
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                progress.update(failed=results[index] == "Error")
+                if on_result:
+                    on_result(index, results[index])
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            progress.close()
+    return results
+
+FINDING_FIELDS = ['topic', 'file1', 'line1', 'text1', 'file2', 'line2', 'text2', 'explanation']
+
+class FindingWriter:
+    """Writes findings to a JSONL or CSV file (chosen by extension) as soon as they are found."""
+
+    def __init__(self, path, append=False):
+        self.is_csv = path.lower().endswith('.csv')
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8', newline='' if self.is_csv else None)
+        if self.is_csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=FINDING_FIELDS)
+            if write_header:
+                self.writer.writeheader()
+
+    def write(self, finding):
+        if self.is_csv:
+            self.writer.writerow(finding)
+        else:
+            self.file.write(json.dumps(finding) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class Checkpoint:
+    """Append-only JSONL record of the verdicts of completed pairs, for resuming an interrupted run.
+
+    The first line records the model and PROMPT_VERSION; a checkpoint written with different
+    ones is not resumed. Each further line holds the VerdictCache key and verdict of a pair.
+    """
+
+    def __init__(self, path, model, resume=False):
+        self.path = path
+        self.header = {'model': model, 'prompt_version': PROMPT_VERSION}
+        self.done = {}
+        if resume and os.path.exists(path):
+            self.done = self._load()
+        # Rewrite the file, dropping any line left half-written by a crash, then append to it
+        self.file = open(path, 'w', encoding='utf-8')
+        self.file.write(json.dumps(self.header) + '\n')
+        for key, verdict in self.done.items():
+            self.file.write(json.dumps({'key': key, 'verdict': verdict}) + '\n')
+        self.file.flush()
+
+    def _load(self):
+        done = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                header = None
+            if header != self.header:
+                print(f"Checkpoint {self.path} was written with a different model or prompt; starting over.")
+                return done
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                done[entry['key']] = entry['verdict']
+        return done
+
+    def add(self, key, verdict):
+        self.file.write(json.dumps({'key': key, 'verdict': verdict}) + '\n')
+        self.file.flush()
+
+    def close(self, completed=False):
+        """Close the file, deleting it if the run completed and there is nothing to resume."""
+        self.file.close()
+        if completed:
+            os.remove(self.path)
+
+def normalize_statement(line):
+    """Key under which identical statements from different files are compared only once."""
+    return re.sub(r'\s+', ' ', line.lower()).strip().rstrip('.;:!')
+
+def collect_statements(file_contents):
+    """Group the tagged lines of all files into unique Statements, in first-seen order."""
+    statements = {}
+    for file, content in file_contents.items():
+        for line, line_num, topics in content:
+            key = normalize_statement(line)
+            if key not in statements:
+                statements[key] = Statement(line, set(), [])
+            statements[key].topics.update(topics)
+            statements[key].occurrences.append((file, line_num, line))
+    return list(statements.values())
+
+def statement_blocks(statement, quantities):
+    """Blocking keys of a statement: a (topic, quantity kind) per topic and kind of quantity it mentions.
+
+    Statements without quantities get no block: they cannot disagree on a number.
+    """
+    return {(topic, quantity.kind) for topic in statement.topics for quantity in quantities[statement.text]}
+
+def candidate_pairs(statements, quantities, blocking=True):
+    """Index pairs (i, j) of statements to compare, each unique pair once.
+
+    With blocking, statements are indexed by statement_blocks() and only statements sharing
+    a block are paired; otherwise every pair sharing a topic is a candidate. Pairs are dropped
+    if all of their occurrences come from a single file, since only cross-file pairs are compared.
+    """
+    files = [frozenset(file for file, _, _ in statement.occurrences) for statement in statements]
+
+    def cross_file(i, j):
+        return not (files[i] == files[j] and len(files[i]) == 1)
+
+    if not blocking:
+        return [(i, j) for i, j in combinations(range(len(statements)), 2)
+                if statements[i].topics & statements[j].topics and cross_file(i, j)]
+
+    index = defaultdict(list)
+    for i, statement in enumerate(statements):
+        for block in statement_blocks(statement, quantities):
+            index[block].append(i)
+    pairs = set()
+    for members in index.values():
+        for i, j in combinations(members, 2):
+            if cross_file(i, j):
+                pairs.add((i, j))
+    return sorted(pairs)
+
+def occurrence_pairs(statement1, statement2, file_order):
+    """Every cross-file (occurrence1, occurrence2) of two statements, earlier file first."""
+    for occurrence1 in statement1.occurrences:
+        for occurrence2 in statement2.occurrences:
+            if occurrence1[0] == occurrence2[0]:
+                continue
+            if file_order[occurrence1[0]] > file_order[occurrence2[0]]:
+                yield occurrence2, occurrence1
+            else:
+                yield occurrence1, occurrence2
+
+def pair_findings(statement1, statement2, topic, verdict, file_order):
+    """Findings for every cross-file occurrence of an inconsistent statement pair."""
+    return [{
+        'topic': topic,
+        'file1': file1,
+        'line1': line_num1,
+        'text1': line1,
+        'file2': file2,
+        'line2': line_num2,
+        'text2': line2,
+        'explanation': verdict
+    } for (file1, line_num1, line1), (file2, line_num2, line2) in occurrence_pairs(statement1, statement2, file_order)]
+
+def find_inconsistencies(file_pattern, prefilter=True, blocking=True, model='llama3.2', workers=4, rate=0,
+                         retries=3, cache_path=DEFAULT_CACHE, topics=DEFAULT_TOPICS, extract_workers=None,
+                         embed_model=None, top_k=5, output_path=None, checkpoint_path=None, resume=False):
+    """Find inconsistencies across files matching the pattern.
+
+    Each line is tagged once with every topic it mentions, and statements are only compared
+    with statements sharing a topic; findings are reported per topic. Identical statements are compared once, however many files repeat them. With blocking,
+    only statements sharing a topic and kind of quantity are paired (see candidate_pairs).
+    With prefilter, pairs settled by prefilter_pair() are not sent to the LLM; the rest are
+    checked concurrently by check_pairs(). Extracted lines and verdicts are cached in SQLite
+    at `cache_path` (None disables it), so later runs only re-read changed files and only ask
+    about pairs they have not seen before. With `embed_model`, only each statement's `top_k`
+    most similar partners are sent to the LLM (see nearest_pairs).
+
+    Findings are appended to `output_path` (JSONL or CSV) as soon as each verdict arrives.
+    Every completed pair is recorded in `checkpoint_path`; with `resume`, pairs recorded there
+    are not checked again, and their findings, already in the output, are not written twice.
+    """
     if not check_ollama_server():
         print("Error: Ollama server is not running on port 11434. Start it with 'ollama serve &'.")
         return
 
-    files = glob.glob(file_pattern)
+    files = sorted(glob.glob(file_pattern))
     if not files:
         print("No files found matching the pattern.")
         return
 
     # Extract content from all files
+    matcher = TopicMatcher(topics)
     file_contents = {}
-    for file in files:
-        content = extract_content(file)
+    for file, content in extract_all(files, workers=extract_workers, cache_path=cache_path).items():
         if content:
-            # Filter only relevant lines
-            relevant_content = [(line, num) for line, num in content if is_relevant_line(line)]
+            # Keep only lines mentioning a topic, tagged with every topic they mention
+            tagged_content = ((line, num, matcher.tags(line)) for line, num in content)
+            relevant_content = [(line, num, tags) for line, num, tags in tagged_content if tags]
             if relevant_content:
                 file_contents[file] = relevant_content
             else:
@@ -175,43 +977,187 @@ def find_inconsistencies(file_pattern):
         print("Need at least two files with relevant lines to compare.")
         return
 
-    # Compare pairs of files
+    # Deduplicate statements and parse the quantities of each one once
+    statements = collect_statements(file_contents)
+    quantities = {statement.text: extract_quantities(statement.text) for statement in statements}
+    file_order = {file: position for position, file in enumerate(file_contents)}
+
+    pairs = candidate_pairs(statements, quantities, blocking=blocking)
+    # Sum over file pairs of the product of their line counts, computed in one pass over the files
+    sizes = [len(content) for content in file_contents.values()]
+    line_pairs = (sum(sizes) ** 2 - sum(size * size for size in sizes)) // 2
+    print(
+        f"{line_pairs} cross-file line pairs reduced to {len(pairs)} candidate pairs of "
+        f"{len(statements)} unique statements" + (" after blocking" if blocking else "")
+    )
+    # A pair sharing several topics is compared once and reported under the first of them
+    topic_order = {topic: position for position, topic in enumerate(matcher.topics)}
+    pair_topics = {(i, j): min(statements[i].topics & statements[j].topics, key=topic_order.get)
+                   for i, j in pairs}
+    if len(matcher.topics) > 1:
+        per_topic = defaultdict(int)
+        for topic in pair_topics.values():
+            per_topic[topic] += 1
+        print("Candidate pairs per topic: " + ", ".join(f"{topic}: {per_topic[topic]}" for topic in matcher.topics))
+
+    # Settle what the rules can, then send the remaining pairs to the LLM
+    resolved = {'no quantities': 0, 'same quantities': 0, 'dissimilar': 0, 'llm': 0}
+    unsettled = []
+    for i, j in pairs:
+        if prefilter:
+            settled = prefilter_pair(quantities[statements[i].text], quantities[statements[j].text])
+            if settled:
+                resolved[settled] += 1
+                continue
+        unsettled.append((i, j))
+    if embed_model and unsettled:
+        try:
+            # Only statements still waiting for a verdict need an embedding
+            needed = sorted({i for pair in unsettled for i in pair})
+            row = {i: position for position, i in enumerate(needed)}
+            embeddings = embed_statements([statements[i].text for i in needed], embed_model, cache_path)
+        except Exception as e:
+            print(f"Error computing embeddings with {embed_model}, comparing all candidate pairs: {e}")
+        else:
+            nearest = [(needed[i], needed[j])
+                       for i, j in nearest_pairs([(row[i], row[j]) for i, j in unsettled], embeddings, top_k)]
+            resolved['dissimilar'] = len(unsettled) - len(nearest)
+            unsettled = nearest
+    llm_pairs = [(statements[i], statements[j], pair_topics[i, j]) for i, j in unsettled]
+    resolved['llm'] = len(llm_pairs)
+
+    lines = [tuple(occurrence[2] for occurrence in next(occurrence_pairs(statement1, statement2, file_order)))
+             for statement1, statement2, _ in llm_pairs]
+    keys = [VerdictCache.key(line1, line2, model) for line1, line2 in lines]
+    checkpoint = Checkpoint(checkpoint_path, model, resume=resume) if checkpoint_path else None
+    writer = FindingWriter(output_path, append=bool(checkpoint and checkpoint.done)) if output_path else None
+    results = [checkpoint.done.get(key) if checkpoint else None for key in keys]
+    if checkpoint and checkpoint.done:
+        print(f"Resuming: {len(results) - results.count(None)} pairs already completed in {checkpoint_path}")
+
+    def record(index, result):
+        """Store a new verdict, stream its findings and checkpoint it."""
+        results[index] = result
+        if writer and "Inconsistent" in result:
+            for finding in pair_findings(*llm_pairs[index], result, file_order):
+                writer.write(finding)
+        if checkpoint and result != "Error":
+            checkpoint.add(keys[index], result)
+
+    cache = VerdictCache(cache_path) if cache_path else None
+    misses = []
+    for index, (line1, line2) in enumerate(lines):
+        if results[index] is not None:
+            continue
+        cached = cache.get(line1, line2, model) if cache else None
+        if cached is None:
+            misses.append(index)
+        else:
+            record(index, cached)
+    completed = False
+    try:
+        check_pairs([lines[index] for index in misses], model=model, workers=workers, rate=rate,
+                    retries=retries, on_result=lambda position, result: record(misses[position], result))
+        completed = True
+    except KeyboardInterrupt:
+        print("\nInterrupted." + (f" Rerun with --resume to continue from {checkpoint_path}." if checkpoint else ""))
+    finally:
+        if cache:
+            cache.put_many([lines[index] + (results[index],) for index in misses
+                            if results[index] not in (None, "Error")], model)
+            cache.close()
+        if writer:
+            writer.close()
+        if checkpoint:
+            checkpoint.close(completed=completed and "Error" not in results)
+    if not completed:
+        return
+
     inconsistencies = []
-    for file1, file2 in combinations(file_contents.keys(), 2):
-        content1 = file_contents[file1]
-        content2 = file_contents[file2]
-
-        # Compare each relevant line in file1 with each relevant line in file2
-        for line1, line_num1 in content1:
-            for line2, line_num2 in content2:
-                result = check_inconsistency(line1, line2, file1, file2, line_num1, line_num2)
-                if "Inconsistent" in result:
-                    inconsistencies.append({
-                        'file1': file1,
-                        'line1': line_num1,
-                        'text1': line1,
-                        'file2': file2,
-                        'line2': line_num2,
-                        'text2': line2,
-                        'explanation': result
-                    })
+    for pair, result in zip(llm_pairs, results):
+        if "Inconsistent" in result:
+            inconsistencies.extend(pair_findings(*pair, result, file_order))
+    inconsistencies.sort(key=lambda inc: (topic_order[inc['topic']], file_order[inc['file1']], inc['line1'],
+                                          file_order[inc['file2']], inc['line2']))
+
+    print(
+        f"\nPairs compared: {sum(resolved.values())} "
+        f"({resolved['no quantities']} without quantities and {resolved['same quantities']} with matching "
+        f"quantities settled by rule, "
+        + (f"{resolved['dissimilar']} skipped as semantically distant, " if embed_model else "")
+        + f"{resolved['llm']} sent to the model)"
+    )
+    if cache:
+        print(f"Verdict cache: {cache.hits} hits, {cache.misses} misses")
+    failed = results.count("Error")
+    if failed:
+        print(f"Warning: {failed} pairs could not be checked because of Ollama errors.")
 
     # Report inconsistencies
     if inconsistencies:
         print("\nInconsistencies found:")
+        topic = None
         for inc in inconsistencies:
+            if len(matcher.topics) > 1 and inc['topic'] != topic:
+                topic = inc['topic']
+                print(f"\n=== Topic: {topic} ===")
             print(f"\nFile: {inc['file1']}, Line {inc['line1']}: {inc['text1']}")
             print(f"File: {inc['file2']}, Line {inc['line2']}: {inc['text2']}")
             print(f"Explanation: {inc['explanation']}")
     else:
         print("No inconsistencies found.")
+    if output_path:
+        print(f"\nFindings written to {output_path}")
 
 def main():
     parser = argparse.ArgumentParser(description="Find inconsistencies in files using Ollama.")
     parser.add_argument('pattern', help="File pattern (e.g., *.docx or *.txt)")
+    parser.add_argument('--no-prefilter', action='store_true',
+                        help="Send every pair to the LLM instead of settling matching quantities by rule.")
+    parser.add_argument('--no-blocking', action='store_true',
+                        help="Compare every pair of statements, not only those mentioning the same kind of quantity.")
+    parser.add_argument('-m', '--model', default='llama3.2', help="Ollama model to use (default: llama3.2).")
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help="Maximum number of concurrent requests to Ollama (default: 4).")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="Maximum requests per second to Ollama; 0 means unlimited (default: 0).")
+    parser.add_argument('--retries', type=int, default=3,
+                        help="Retries with exponential backoff on transient Ollama errors (default: 3).")
+    parser.add_argument('--cache', default=DEFAULT_CACHE,
+                        help=f"SQLite file caching extracted lines and verdicts across runs (default: {DEFAULT_CACHE}).")
+    parser.add_argument('--no-cache', action='store_true', help="Neither read nor write the cache.")
+    parser.add_argument('--embed-model',
+                        help="Ollama embedding model (e.g. nomic-embed-text); only each statement's most "
+                             "similar partners are then checked.")
+    parser.add_argument('--top-k', type=int, default=5,
+                        help="With --embed-model, most similar partners checked per statement (default: 5).")
+    parser.add_argument('--extract-workers', type=int, default=None,
+                        help="Processes used to extract documents (default: number of CPUs).")
+    parser.add_argument('--topic', action='append', default=[],
+                        help="Topic to audit, as a phrase or 'name=keyword1,keyword2'; repeatable "
+                             "(default: 'return policy').")
+    parser.add_argument('--keywords-file', help="File with one topic per line, as 'name: keyword1, keyword2'.")
+    parser.add_argument('-o', '--output',
+                        help="Write findings as they are found to this file, as CSV if it ends in .csv, else JSONL.")
+    parser.add_argument('--checkpoint', help="File recording completed pairs, so an interrupted run can be resumed.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip pairs already completed in --checkpoint and append to --output.")
     args = parser.parse_args()
 
-    find_inconsistencies(args.pattern)
+    if args.resume and not args.checkpoint:
+        print("Error: --resume requires --checkpoint.")
+        return
+    try:
+        topics = load_topics(args.topic, args.keywords_file)
+    except OSError as e:
+        print(f"Error reading keywords file: {e}")
+        return
+
+    find_inconsistencies(args.pattern, prefilter=not args.no_prefilter, blocking=not args.no_blocking,
+                         model=args.model, workers=args.workers, rate=args.rate, retries=args.retries,
+                         cache_path=None if args.no_cache else args.cache, topics=topics,
+                         extract_workers=args.extract_workers, embed_model=args.embed_model, top_k=args.top_k,
+                         output_path=args.output, checkpoint_path=args.checkpoint, resume=args.resume)
 
 if __name__ == "__main__":
     main()
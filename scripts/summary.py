@@ -11,8 +11,13 @@ For CSVs, it calculates forex trading metrics (total trades, total profit/loss,
 Summaries are printed to the terminal and saved to files named 'summary_<original_filename>.txt'.
 
 Functionality:
-- Supports multiple file formats: .txt, .docx, .pdf, .rtf, .md, .html, .csv.
-- For CSVs, identifies profit/loss columns and computes trading metrics.
+- With --recursive, crawls a directory tree and keeps a manifest so that repeated runs only
+  summarize new or modified files and can remove summaries of deleted files.
+- Supports multiple file formats: .txt, .docx, .pdf, .rtf, .md, .html, .csv, .pptx, .eml.
+- Extractors are registered per extension and import their libraries only on first use,
+  so a run over *.txt files never loads pdfplumber, python-docx, pandas, etc.
+- For CSVs, identifies profit/loss columns and computes trading metrics in a single chunked pass,
+  reading only the profit, 'Pair' and trade date columns, so multi-GB broker exports fit in memory.
 - Uses Ollama's local LLM for summarization, ensuring data privacy.
 - Processes files matching a user-specified wildcard pattern (e.g., '*.txt', '*.csv').
 
@@ -22,6 +27,53 @@ Arguments:
 - -m, --model (optional): Ollama model for summarization.
   Default: llama3.2.
   Example: -m llama3.1:70b
+- -w, --workers (optional): Number of concurrent Ollama requests. With more than one worker,
+  text extraction runs in a process pool and overlaps with the LLM calls.
+  Default: 1 (process files one at a time).
+  Example: -w 4
+- --extract-workers (optional): Number of processes used for text extraction when --workers > 1.
+  Default: the number of CPUs.
+- --cache-dir (optional): Directory of the persistent summary cache.
+  Default: ~/.cache/summary_py
+- --cache-max-mb (optional): Size limit of the summary cache; least recently used entries are evicted.
+  Default: 512
+- --no-cache (optional): Always call Ollama, neither reading nor writing the summary cache.
+- --chunked (optional): Map-reduce mode for long documents. The text is split into token-budgeted
+  chunks on page/paragraph boundaries, the chunks are summarized in parallel (up to --workers at once),
+  and the partial summaries are combined in a final reduce step.
+- --chunk-tokens (optional): Token budget per chunk in --chunked mode.
+  Default: the model's entry in MODEL_CHUNK_TOKENS, or DEFAULT_CHUNK_TOKENS for other models.
+- --pack-tokens (optional): Batch small text documents. Documents of at most a quarter of this
+  token budget are packed (up to PACK_MAX_DOCS at a time) into one prompt that asks for delimited
+  per-document summaries, which are split back into the individual summary files. If the reply
+  cannot be split, each document of the batch is summarized on its own. Default: 0 (disabled)
+- --csv-breakdown (optional): Add per-pair ('pair'), per-day ('day') or both ('all') aggregates
+  of CSV trading logs to the prompt. Days come from the first of the 'Close Time', 'Date', 'Time'...
+  columns present. Default: none
+- --csv-chunk-rows (optional): Rows read per chunk when computing CSV metrics. Default: 250000
+- --plugin (optional, repeatable): Python module or .py file that registers extractors for extra
+  file extensions with register_extractor(). Example: --plugin odt_extractor.py
+- --profile-startup (optional): After the run, report the import time of each extractor's libraries.
+- -r, --recursive (optional): Crawl the --root directory tree (default: current directory) instead of
+  globbing the current directory. Files are selected with --include patterns (default: the pattern
+  argument) minus --exclude patterns; both are repeatable and match the file name or the path relative
+  to --root. Summaries go to --output-dir (default: <root>/summaries), mirroring the tree, as
+  summary_<filename>.txt (e.g. summary_report.pdf.txt).
+- --manifest (optional): Manifest of a --recursive run, recording path, size, mtime, SHA-256, summary
+  file and model of every summarized file. Later runs only process new or modified files.
+  Default: <output-dir>/.summary_manifest.json
+- --prune (optional): With --recursive, delete summaries whose source files no longer exist.
+- --stream (optional): Print the summary tokens as they arrive and write them progressively to
+  summary_<filename>.txt. Files are processed one at a time; --workers then only applies to chunks.
+- --run-log (optional): JSON Lines file that receives one record per file: status (ok, cached, failed),
+  number of Ollama calls, time to first token (ttft_s), total time (total_s), prompt and generated
+  token counts, tokens/s (wall clock) and eval_tokens_per_s (decode speed reported by Ollama).
+  Example: --run-log runs.jsonl
+- --host, --port (optional): Address of the Ollama server. Default: localhost 11434
+- --timeout, --connect-timeout (optional): Response and connect timeouts in seconds. Default: 300, 5
+- --health-ttl (optional): Seconds a successful server health check is reused. Default: 30
+- --retries (optional): Retries, with exponential backoff, while the server is unreachable or
+  a request fails transiently (connection errors, timeouts, 5xx). Default: 5
 
 Usage:
 Run the script from the command line in the directory containing the files to summarize.
@@ -32,6 +84,15 @@ Examples:
     python summary.py *.pdf            # Summarize all *.pdf files
     python summary.py project*.docx    # Summarize files matching project*.docx
     python summary.py -m llama3.1 *.rtf # Use llama3.1 model to summarize *.rtf files
+    python summary.py -w 4 *.pdf       # Summarize *.pdf files with 4 concurrent Ollama requests
+    python summary.py --no-cache *.md  # Re-summarize *.md files even if a cached summary exists
+    python summary.py --chunked -w 4 report.pdf  # Summarize a long PDF in parallel chunks
+    python summary.py --csv-breakdown all *.csv  # Include per-pair and per-day results for CSVs
+    python summary.py --profile-startup *.txt    # Show which extractor libraries were imported, and how long it took
+    python summary.py --stream --run-log runs.jsonl -m llama3.1 big.pdf  # Watch the summary being generated, log latency
+    python summary.py --pack-tokens 4000 -w 2 *.md  # Summarize short notes several per request
+    python summary.py -r --root /mnt/share --include '*.pdf' --include '*.docx' --exclude archive --prune -w 4
+                                       # Incremental run over a directory tree
     python summary.py -h               # Show help message
 
 Python Version:
@@ -48,7 +109,10 @@ Required Python Libraries:
 - markdown: Convert Markdown to plain text
 - beautifulsoup4: Parse .html files
 - requests: Check Ollama server status
+- httpx: Pooled keep-alive HTTP client for Ollama requests (installed with ollama)
 - pandas: Process .csv files
+- numpy: Vectorized CSV metrics (installed with pandas)
+- python-pptx (optional): Read .pptx files
 Install libraries in a virtual environment:
     python3 -m venv venv
     source venv/bin/activate  # On macOS/Linux
@@ -74,141 +138,1274 @@ Ollama Installation and Setup:
    If in use, kill the process: kill <PID>, then restart the server
 6. Confirm Ollama process:
     ps aux | grep ollama
-Note: The Ollama server must be running before executing the script.
+Note: The Ollama server must be running before executing the script. If it is not reachable,
+the script backs off and retries (see --retries) before skipping a file.
+
+Parallel Runs:
+- With --workers N, summaries are still printed and written in the same order as a sequential run,
+  so a file whose stem is shared by another input (e.g. report.txt and report.pdf) always ends up
+  with the same summary_<stem>.txt content.
+- Match N to the server's OLLAMA_NUM_PARALLEL setting; extra workers only queue on the server.
+- The run ends with a throughput line (files/s, tokens/s) that can be used to size N.
+
+Summary Cache:
+- Summaries are cached on disk under a SHA-256 of (extracted text or CSV metrics, model, prompt template),
+  so unchanged files are not sent to Ollama again; a new model or prompt automatically misses the cache.
+- Cache hits refresh the entry's modification time, and the oldest entries are evicted once
+  the cache grows past --cache-max-mb.
+
+Chunked Summarization:
+- Ollama silently truncates prompts longer than the model's context window (num_ctx), so long
+  documents should be summarized with --chunked.
+- Token counts are estimated at roughly four characters per token; keep the chunk budget well
+  below num_ctx to leave room for the prompt scaffold and the reply.
+- Documents that fit in a single chunk are summarized with one call, exactly as without --chunked.
+- In --chunked mode, PDFs are streamed: pages are extracted one at a time, packed into chunks and
+  sent to Ollama as they fill up, so memory use stays flat regardless of page count. Streamed PDFs
+  are cached under a hash of the PDF file's bytes, since their full text is never held in memory.
 """
 
 import argparse
+from collections import deque
+import contextvars
+import fnmatch
 import glob
+import hashlib
+import json
 import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import partial
+from itertools import chain
 from pathlib import Path
-import ollama
-from docx import Document
-import pdfplumber
-from striprtf.striprtf import rtf_to_text
-from bs4 import BeautifulSoup
+import importlib
+import importlib.util
 import sys
-import markdown
-import requests
-import pandas as pd
 
-def check_ollama_server():
-    """Check if the Ollama server is running on the default port (11434)."""
-    url = "http://localhost:11434"
-    try:
-        response = requests.get(url)
-        if response.status_code == 200 and response.text == "Ollama is running":
-            return True
-        return False
-    except requests.ConnectionError:
+SCRIPT_START = time.perf_counter()
+
+# Seconds spent importing each lazily loaded module in this process; see lazy_import().
+IMPORT_TIMES = {}
+_LAZY_MODULES = {}
+_LAZY_IMPORT_LOCK = threading.Lock()
+
+def lazy_import(module_name):
+    """Import a module on first use and record how long the import took.
+
+    Safe to call from several threads: a module is never handed out half-initialized.
+    """
+    module = _LAZY_MODULES.get(module_name)
+    if module is None:
+        with _LAZY_IMPORT_LOCK:
+            module = _LAZY_MODULES.get(module_name)
+            if module is None:
+                already_loaded = module_name in sys.modules
+                start = time.perf_counter()
+                module = importlib.import_module(module_name)
+                if not already_loaded:
+                    IMPORT_TIMES[module_name] = time.perf_counter() - start
+                _LAZY_MODULES[module_name] = module
+    return module
+
+class RunStats:
+    """Thread-safe counters used to report end-of-run throughput."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.files = 0
+        self.tokens = 0
+
+    def add_tokens(self, count):
+        with self.lock:
+            self.tokens += count
+
+    def add_file(self):
+        with self.lock:
+            self.files += 1
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (
+            f"Summarized {self.files} file(s) in {elapsed:.1f}s: "
+            f"{self.files / elapsed:.2f} files/s, {self.tokens / elapsed:.1f} tokens/s "
+            f"({self.tokens} generated tokens)"
+        )
+
+RUN_STATS = RunStats()
+
+class FileMetrics:
+    """Latency and token counts of one file's summarization, for the run log.
+
+    Time to first token is measured from the start of the file's summarization to the first
+    token of the final summary (the reduce step, in --chunked mode).
+    """
+
+    def __init__(self, file_path, on_token=None):
+        self.file_path = file_path
+        self.on_token = on_token
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.end = None
+        self.calls = 0
+        self.tokens = 0
+        self.prompt_tokens = 0
+        self.eval_seconds = 0.0
+        self.cached = False
+        # Number of documents summarized together with this one (see DocumentPacker), and
+        # those of them whose summary came from the cache.
+        self.batch_size = 1
+        self.cached_files = set()
+        self.lock = threading.Lock()
+
+    def token(self, text):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        if self.on_token is not None:
+            self.on_token(text)
+
+    def add_call(self, response):
+        with self.lock:
+            self.calls += 1
+            self.tokens += response.get('eval_count') or 0
+            self.prompt_tokens += response.get('prompt_eval_count') or 0
+            self.eval_seconds += (response.get('eval_duration') or 0) / 1e9
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    def record(self, model, status, file_path=None):
+        """A JSON-serializable run log entry.
+
+        For a batch of packed documents, every file gets the batch's numbers and its batch_size.
+        """
+        total = (self.end or time.perf_counter()) - self.start
+        cached = self.cached or (file_path or self.file_path) in self.cached_files
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'file': file_path or self.file_path,
+            'model': model,
+            'status': 'cached' if cached and status == 'ok' else status,
+            'calls': self.calls,
+            'ttft_s': round(self.first_token_at - self.start, 4) if self.first_token_at else None,
+            'total_s': round(total, 4),
+            'prompt_tokens': self.prompt_tokens,
+            'tokens': self.tokens,
+            'tokens_per_s': round(self.tokens / total, 2) if self.tokens and total > 0 else None,
+            # Decode speed reported by the server, independent of queueing and prompt processing.
+            'eval_tokens_per_s': round(self.tokens / self.eval_seconds, 2) if self.eval_seconds else None,
+            'batch_size': self.batch_size,
+        }
+
+# The FileMetrics of the file being summarized in the current thread/context, if any.
+CURRENT_FILE = contextvars.ContextVar('CURRENT_FILE', default=None)
+
+def submit_in_context(pool, fn, *args):
+    """pool.submit() that runs fn in a copy of the caller's context, so CURRENT_FILE follows it."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+class RunLog:
+    """Appends one JSON line per summarized file (see FileMetrics.record)."""
+
+    def __init__(self, path, model):
+        self.path = path
+        self.model = model
+
+    def write(self, metrics, status, file_path=None):
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(metrics.record(self.model, status, file_path)) + '\n')
+        except OSError as e:
+            print(f"Error writing run log {self.path}: {str(e)}")
+
+TEXT_PROMPT = 'Summarize this text in a concise paragraph:\n\n{text}'
+CSV_PROMPT = (
+    "Generate a concise summary of the following forex trading log metrics. "
+    "Include total trades, total profit, total loss, net profit/loss, percentage of profitable and loss-making trades, and mention key currency pairs if available. "
+    "If a per-pair or per-day breakdown is included, point out the best and worst performers:\n\n"
+    "{text}"
+)
+CHUNK_PROMPT = (
+    "The following text is one part of a longer document. "
+    "Summarize this part in a concise paragraph, keeping names, figures and conclusions:\n\n{text}"
+)
+REDUCE_PROMPT = (
+    "The following are summaries of consecutive parts of one document. "
+    "Combine them into a single concise paragraph summarizing the whole document:\n\n{text}"
+)
+PACKED_PROMPT = (
+    "Below are {count} separate documents, each starting with a line of the form <<<DOC n>>>. "
+    "Summarize each document independently in a concise paragraph. Reply with exactly {count} sections "
+    "in document order; start each section with the line <<<SUMMARY n>>> (n being the document number) "
+    "followed only by that document's summary.\n\n{text}"
+)
+# Most documents packed into one prompt, even if more would fit in the token budget.
+PACK_MAX_DOCS = 10
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'summary_py')
+
+# Token budget per chunk in --chunked mode, keyed by model name (with or without a tag).
+# Keep these below the context size the model is served with (Ollama's num_ctx).
+DEFAULT_CHUNK_TOKENS = 1500
+MODEL_CHUNK_TOKENS = {
+    'llama3.2': 1500,
+    'llama3.1': 1500,
+    'llama3.1:70b': 3000,
+    'mistral': 3000,
+}
+
+class OllamaConnection:
+    """One keep-alive connection pool to the Ollama server, shared by every request in a run.
+
+    The server health check is cached for `health_ttl` seconds. When the server is down or a
+    request fails with a transient error, calls back off exponentially and retry instead of
+    giving up on the file. If the server stays down through a whole backoff schedule, the
+    connection is marked dead for `health_ttl` seconds: calls fail at once meanwhile, and the
+    first call after that probes the server once (without the schedule), reviving the
+    connection if it answers. A batch therefore neither waits out the schedule for every
+    remaining file nor loses all of them to a short server restart. At most `concurrency`
+    requests are in flight at once.
+    """
+
+    def __init__(self, host='localhost', port=11434, timeout=300.0, connect_timeout=5.0,
+                 health_ttl=30.0, retries=5, backoff=2.0, concurrency=1):
+        self.base_url = f"http://{host}:{port}"
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.health_ttl = health_ttl
+        self.retries = retries
+        self.backoff = backoff
+        self.concurrency = concurrency
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.lock = threading.Lock()
+        self.init_lock = threading.Lock()
+        self.healthy_until = 0.0
+        self.dead_until = None
+        self._session = None
+        self._client = None
+
+    @property
+    def session(self):
+        """requests session used for the health check (created on first use)."""
+        if self._session is None:
+            with self.init_lock:
+                if self._session is None:
+                    requests = lazy_import('requests')
+                    lazy_import('requests.adapters')
+                    session = requests.Session()
+                    session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1))
+                    self._session = session
+        return self._session
+
+    @property
+    def client(self):
+        """ollama.Client backed by a pooled keep-alive httpx client (created on first use)."""
+        if self._client is None:
+            with self.init_lock:
+                if self._client is None:
+                    ollama = lazy_import('ollama')
+                    httpx = lazy_import('httpx')
+                    self._client = ollama.Client(
+                        host=self.base_url,
+                        timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                        limits=httpx.Limits(max_connections=self.concurrency,
+                                            max_keepalive_connections=self.concurrency),
+                    )
+        return self._client
+
+    def _retry_delay(self, attempt):
+        return min(self.backoff * (2 ** attempt), 60.0)
+
+    def is_running(self):
+        """Probe the server, reusing a successful result for `health_ttl` seconds."""
+        with self.lock:
+            if time.monotonic() < self.healthy_until:
+                return True
+        # The probe runs outside the lock so other workers are not serialized behind it
+        try:
+            response = self.session.get(self.base_url, timeout=(self.connect_timeout, self.connect_timeout))
+            running = response.status_code == 200 and response.text == "Ollama is running"
+        except lazy_import('requests').RequestException:
+            running = False
+        with self.lock:
+            self.healthy_until = time.monotonic() + self.health_ttl if running else 0.0
+        return running
+
+    def invalidate(self):
+        """Forget the cached health check, e.g. after a failed request."""
+        with self.lock:
+            self.healthy_until = 0.0
+
+    def wait_until_running(self):
+        """Return True once the server answers, retrying with exponential backoff.
+
+        After one full schedule without an answer the connection is dead: this returns False
+        immediately for `health_ttl` seconds, then probes once and either revives the
+        connection or stays dead for another `health_ttl` seconds.
+        """
+        with self.lock:
+            dead_until = self.dead_until
+        if dead_until is not None:
+            if time.monotonic() < dead_until:
+                return False
+            running = self.is_running()
+            with self.lock:
+                if running:
+                    self.dead_until = None
+                    print(f"Ollama server at {self.base_url} is reachable again.")
+                else:
+                    self.dead_until = time.monotonic() + self.health_ttl
+            return running
+        for attempt in range(self.retries + 1):
+            if self.is_running():
+                return True
+            with self.lock:
+                if self.dead_until is not None:
+                    return False
+            if attempt < self.retries:
+                delay = self._retry_delay(attempt)
+                print(f"Ollama server at {self.base_url} is not reachable; retrying in {delay:.0f}s...")
+                time.sleep(delay)
+        with self.lock:
+            if self.dead_until is None:
+                print(f"Ollama server at {self.base_url} did not come back; skipping requests for "
+                      f"{self.health_ttl:.0f}s before checking again.")
+            self.dead_until = time.monotonic() + self.health_ttl
         return False
 
+    @staticmethod
+    def _is_transient(error):
+        if isinstance(error, lazy_import('ollama').ResponseError):
+            return error.status_code >= 500 or error.status_code == 429
+        return isinstance(error, (ConnectionError, lazy_import('httpx').TransportError))
+
+    def chat_stream(self, **kwargs):
+        """Streaming ollama.Client.chat(): yields response chunks as they arrive.
+
+        Retries like chat(), but only until the first chunk has been received.
+        """
+        for attempt in range(self.retries + 1):
+            if not self.wait_until_running():
+                raise ConnectionError(f"Ollama server at {self.base_url} is not running.")
+            received = False
+            try:
+                with self.slots:
+                    for chunk in self.client.chat(stream=True, **kwargs):
+                        received = True
+                        yield chunk
+                return
+            except Exception as e:
+                if received or not self._is_transient(e) or attempt == self.retries:
+                    raise
+                self.invalidate()
+                delay = self._retry_delay(attempt)
+                print(f"Ollama request failed ({str(e)}); retrying in {delay:.0f}s...")
+                time.sleep(delay)
+
+    def chat(self, **kwargs):
+        """ollama.Client.chat() with a health check, a concurrency slot and retries."""
+        for attempt in range(self.retries + 1):
+            if not self.wait_until_running():
+                raise ConnectionError(f"Ollama server at {self.base_url} is not running.")
+            try:
+                with self.slots:
+                    return self.client.chat(**kwargs)
+            except Exception as e:
+                if not self._is_transient(e) or attempt == self.retries:
+                    raise
+                self.invalidate()
+                delay = self._retry_delay(attempt)
+                print(f"Ollama request failed ({str(e)}); retrying in {delay:.0f}s...")
+                time.sleep(delay)
+
+OLLAMA = OllamaConnection()
+
+def configure_ollama(**kwargs):
+    """Replace the shared Ollama connection, e.g. with a different host or concurrency."""
+    global OLLAMA
+    OLLAMA = OllamaConnection(**kwargs)
+    return OLLAMA
+
+def server_not_running_message():
+    return f"Error: Ollama server is not running at {OLLAMA.base_url}. Start it with 'ollama serve &'."
+
+class SummaryCache:
+    """Content-addressed on-disk store of summaries with size-based LRU eviction.
+
+    Each entry is a file named after the SHA-256 of (payload, model, prompt template).
+    An entry's mtime is its last use, so eviction removes the oldest files first.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(payload, model, template):
+        digest = hashlib.sha256()
+        for part in (template, model, payload):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.txt"
+
+    def get(self, key, count=True):
+        """Return the cached summary for key, or None on a miss.
+
+        With count=False the lookup is left out of the hit/miss statistics; the caller then
+        reports the file's outcome once with count().
+        """
+        path = self._path(key)
+        try:
+            summary = path.read_text(encoding='utf-8')
+            os.utime(path)
+        except OSError:
+            summary = None
+        if count:
+            self.count(summary is not None)
+        return summary
+
+    def count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key, summary):
+        """Store a summary, then evict least recently used entries if over the size limit."""
+        path = self._path(key)
+        try:
+            old_size = path.stat().st_size
+        except OSError:
+            old_size = 0
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(summary, encoding='utf-8')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing summary cache entry {path}: {str(e)}")
+            return
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(entry.stat().st_size for entry in self._entries())
+            else:
+                self.total_bytes += path.stat().st_size - old_size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        return self.cache_dir.glob('??/*.txt')
+
+    def _evict(self):
+        """Delete the least recently used entries until the cache is at 90% of its limit."""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        entries.sort()
+        self.total_bytes = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, entry in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                entry.unlink()
+                self.total_bytes -= size
+            except OSError:
+                pass
+
+    def report(self):
+        return f"Summary cache: {self.hits} hit(s), {self.misses} miss(es) in {self.cache_dir}"
+
+def check_ollama_server():
+    """Check that the Ollama server is running, backing off and retrying while it is not.
+
+    The result of a successful check is cached for the run's health TTL.
+    """
+    return OLLAMA.wait_until_running()
+
+class Extractor:
+    """A registered text extractor: a generator function and the modules it imports lazily."""
+
+    def __init__(self, func, backends):
+        self.func = func
+        self.backends = tuple(backends)
+
+# Text extractors keyed by lower-case file extension; see register_extractor().
+EXTRACTORS = {}
+
+def register_extractor(*extensions, backends=()):
+    """Register a generator function yielding the text of a file, in order, for the given extensions.
+
+    `backends` lists the modules the extractor imports (through lazy_import) on first use;
+    they are only reported by --profile-startup. New formats can be added from a plugin module
+    loaded with --plugin, without editing this file:
+
+        from summary import lazy_import, register_extractor
+
+        @register_extractor('.odt', backends=('odf',))
+        def iter_odt_text(file_path):
+            ...
+    """
+    def decorator(func):
+        for ext in extensions:
+            EXTRACTORS[ext.lower()] = Extractor(func, backends)
+        return func
+    return decorator
+
+def _read_text(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+@register_extractor('.txt')
+def iter_txt_text(file_path):
+    yield _read_text(file_path)
+
+@register_extractor('.doc', '.docx', backends=('docx',))
+def iter_docx_text(file_path):
+    doc = lazy_import('docx').Document(file_path)
+    yield '\n'.join([para.text for para in doc.paragraphs if para.text.strip()])
+
+@register_extractor('.pdf', backends=('pdfplumber',))
+def iter_pdf_pages(file_path):
+    """Yield the text of a PDF one page at a time, releasing each page's parsed objects afterwards."""
+    with lazy_import('pdfplumber').open(file_path) as pdf:
+        for page in pdf.pages:
+            try:
+                yield page.extract_text() or ''
+            finally:
+                # Page.close() flushes the cached layout objects (pdfplumber >= 0.11).
+                close = getattr(page, 'close', None) or page.flush_cache
+                close()
+
+@register_extractor('.rtf', backends=('striprtf.striprtf',))
+def iter_rtf_text(file_path):
+    yield lazy_import('striprtf.striprtf').rtf_to_text(_read_text(file_path))
+
+@register_extractor('.md', backends=('markdown',))
+def iter_markdown_text(file_path):
+    yield lazy_import('markdown').markdown(_read_text(file_path), output_format='plain')
+
+@register_extractor('.html', backends=('bs4',))
+def iter_html_text(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        soup = lazy_import('bs4').BeautifulSoup(f, 'html.parser')
+        yield soup.get_text(separator='\n', strip=True)
+
+@register_extractor('.csv', backends=('pandas',))
+def iter_csv_text(file_path):
+    yield lazy_import('pandas').read_csv(file_path).to_string(index=False)
+
+@register_extractor('.pptx', backends=('pptx',))
+def iter_pptx_text(file_path):
+    """Yield the text of each slide (requires python-pptx)."""
+    presentation = lazy_import('pptx').Presentation(file_path)
+    for slide in presentation.slides:
+        yield '\n'.join(shape.text_frame.text for shape in slide.shapes
+                        if shape.has_text_frame and shape.text_frame.text.strip())
+
+@register_extractor('.eml', backends=('email',))
+def iter_eml_text(file_path):
+    """Yield the headers and plain-text (or HTML-stripped) body of an e-mail message."""
+    email = lazy_import('email')
+    lazy_import('email.policy')
+    with open(file_path, 'rb') as f:
+        message = email.message_from_binary_file(f, policy=email.policy.default)
+    yield '\n'.join(f"{header}: {message[header]}" for header in ('From', 'To', 'Date', 'Subject') if message[header])
+    body = message.get_body(preferencelist=('plain', 'html'))
+    if body is not None:
+        content = body.get_content()
+        if body.get_content_type() == 'text/html':
+            content = lazy_import('bs4').BeautifulSoup(content, 'html.parser').get_text(separator='\n', strip=True)
+        yield content
+
+def iter_text_from_file(file_path):
+    """Yield the text of a file in segments (pages, slides, ...) using the registered extractor."""
+    ext = Path(file_path).suffix.lower()
+    extractor = EXTRACTORS.get(ext)
+    if extractor is None:
+        raise ValueError(f"Unsupported file extension: {ext}")
+    return extractor.func(file_path)
+
+def file_digest(file_path):
+    """SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 def extract_text_from_file(file_path):
     """Extract text from a file based on its extension."""
-    ext = Path(file_path).suffix.lower()
-    
     try:
-        if ext == '.txt':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        elif ext in ['.doc', '.docx']:
-            doc = Document(file_path)
-            return '\n'.join([para.text for para in doc.paragraphs if para.text.strip()])
-        elif ext == '.pdf':
-            with pdfplumber.open(file_path) as pdf:
-                return '\n'.join([page.extract_text() or '' for page in pdf.pages])
-        elif ext == '.rtf':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                rtf_content = f.read()
-                return rtf_to_text(rtf_content)
-        elif ext == '.md':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                md_text = f.read()
-                return markdown.markdown(md_text, output_format='plain')
-        elif ext == '.html':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                soup = BeautifulSoup(f, 'html.parser')
-                return soup.get_text(separator='\n', strip=True)
-        elif ext == '.csv':
-            df = pd.read_csv(file_path)
-            return df.to_string(index=False)
-        else:
-            raise ValueError(f"Unsupported file extension: {ext}")
+        return '\n'.join(iter_text_from_file(file_path))
     except Exception as e:
         print(f"Error reading {file_path}: {str(e)}")
         return None
 
-def summarize_csv(df, model='llama3.2'):
-    """Generate a forex-focused summary for a CSV trading log."""
+def load_plugins(plugins):
+    """Import plugin modules that register extra extractors.
+
+    When this file runs as a script, it is made importable as `summary` first, so
+    that plugins register into this module's EXTRACTORS rather than a second copy.
+    """
+    sys.modules.setdefault('summary', sys.modules[__name__])
+    for plugin in plugins:
+        if plugin.endswith('.py') or os.sep in plugin:
+            spec = importlib.util.spec_from_file_location(Path(plugin).stem, plugin)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        else:
+            importlib.import_module(plugin)
+
+def startup_report(main_start):
+    """Describe how long each extractor's (and the Ollama client's) imports took in this process."""
+    lines = ["Startup profile (this process; extraction workers import separately):",
+             f"- module load to main(): {(main_start - SCRIPT_START) * 1000:.1f} ms"]
+    def describe(modules):
+        if all(module not in _LAZY_MODULES for module in modules):
+            return "not loaded"
+        return ', '.join(f"{module} {IMPORT_TIMES.get(module, 0.0) * 1000:.1f} ms"
+                         for module in modules if module in _LAZY_MODULES)
+    for ext, extractor in sorted(EXTRACTORS.items()):
+        lines.append(f"- {ext}: {describe(extractor.backends) if extractor.backends else 'no imports'}")
+    lines.append(f"- Ollama client: {describe(('ollama', 'httpx', 'requests'))}")
+    lines.append(f"- CSV metrics: {describe(('pandas', 'numpy'))}")
+    return '\n'.join(lines)
+
+class ForexMetrics:
+    """Running forex trading metrics, updated one DataFrame chunk at a time.
+
+    Only the profit/loss, 'Pair' and trade date columns are read, so multi-GB broker
+    exports can be processed in a single pass with bounded memory via from_csv().
+    """
+
+    PROFIT_COLUMNS = ['profit', 'p/l', 'pnl', 'profit/loss']
+    # Checked in order; the close time is the natural "day" of a realized profit.
+    DATE_COLUMNS = ['close time', 'close date', 'date', 'datetime', 'timestamp', 'time', 'open time', 'open date']
+    AGGREGATES = ['trades', 'net', 'wins', 'losses', 'gross_profit', 'gross_loss']
+
+    def __init__(self, columns):
+        lower = {col.lower(): col for col in columns}
+        self.profit_col = next((lower[name] for name in self.PROFIT_COLUMNS if name in lower), None)
+        if not self.profit_col:
+            raise ValueError("No 'Profit' or similar column found in CSV.")
+        self.pair_col = 'Pair' if 'Pair' in columns else None
+        self.date_col = next((lower[name] for name in self.DATE_COLUMNS if name in lower), None)
+
+        self.trades = 0
+        self.wins = 0
+        self.losses = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.net = 0.0
+        self.pairs = {}  # insertion-ordered, so pairs are listed in order of first appearance
+        self.by_pair = None
+        self.by_day = None
+
+    @classmethod
+    def from_csv(cls, file_path, chunk_rows=250_000):
+        """Compute metrics for a CSV file, reading only the needed columns chunk by chunk."""
+        pd = lazy_import('pandas')
+        metrics = cls(pd.read_csv(file_path, nrows=0).columns)
+        usecols = [col for col in (metrics.profit_col, metrics.pair_col, metrics.date_col) if col]
+        # The profit column is left to type inference: non-numeric cells such as '$5' are
+        # coerced to NaN in update() rather than failing the whole file.
+        dtype = {}
+        if metrics.pair_col:
+            dtype[metrics.pair_col] = 'category'
+        if metrics.date_col:
+            dtype[metrics.date_col] = 'string'
+        for chunk in pd.read_csv(file_path, usecols=usecols, dtype=dtype, chunksize=chunk_rows):
+            metrics.update(chunk)
+        return metrics
+
+    @classmethod
+    def from_dataframe(cls, df):
+        metrics = cls(df.columns)
+        metrics.update(df)
+        return metrics
+
+    def update(self, chunk):
+        """Fold one chunk of trades into the running totals."""
+        pd = lazy_import('pandas')
+        np = lazy_import('numpy')
+        profit = pd.to_numeric(chunk[self.profit_col], errors='coerce').to_numpy(dtype='float64')
+        win = profit > 0
+        loss = profit < 0
+        gross_profit = np.where(win, profit, 0.0)
+        gross_loss = np.where(loss, profit, 0.0)
+
+        self.trades += len(profit)
+        self.wins += int(win.sum())
+        self.losses += int(loss.sum())
+        self.gross_profit += float(gross_profit.sum())
+        self.gross_loss += float(gross_loss.sum())
+        self.net += float(np.nansum(profit))
+
+        if not self.pair_col and not self.date_col:
+            return
+        frame = pd.DataFrame({
+            'trades': 1, 'net': np.nan_to_num(profit), 'wins': win, 'losses': loss,
+            'gross_profit': gross_profit, 'gross_loss': gross_loss,
+        }, index=chunk.index)
+        if self.pair_col:
+            pairs = chunk[self.pair_col]
+            self.pairs.update(dict.fromkeys(pairs.dropna().unique()))
+            self.by_pair = self._merge(self.by_pair, frame.groupby(pairs.to_numpy(), sort=False).sum())
+        if self.date_col:
+            days = pd.to_datetime(chunk[self.date_col], errors='coerce').dt.normalize()
+            self.by_day = self._merge(self.by_day, frame.groupby(days.to_numpy(), sort=False).sum())
+
+    @staticmethod
+    def _merge(total, part):
+        return part if total is None else total.add(part, fill_value=0)
+
+    def _breakdown_lines(self, table, title, label, max_rows):
+        if table is None or table.empty:
+            return []
+        lines = [f"{title}:"]
+        for key, row in table.head(max_rows).iterrows():
+            trades = int(row['trades'])
+            win_rate = row['wins'] / trades * 100 if trades else 0
+            lines.append(
+                f"- {label(key)}: {trades} trades, net ${row['net']:.2f}, "
+                f"profit ${row['gross_profit']:.2f}, loss ${row['gross_loss']:.2f}, {win_rate:.2f}% profitable"
+            )
+        if len(table) > max_rows:
+            lines.append(f"- ... {len(table) - max_rows} more")
+        return lines
+
+    def text(self, breakdown=(), max_rows=50):
+        """Metrics as prompt text; breakdown may include 'pair' and/or 'day'."""
+        percent_profitable = (self.wins / self.trades * 100) if self.trades > 0 else 0
+        percent_loss = (self.losses / self.trades * 100) if self.trades > 0 else 0
+        lines = [
+            f"Total Trades: {self.trades}",
+            f"Total Profit: ${self.gross_profit:.2f}",
+            f"Total Loss: ${self.gross_loss:.2f}",
+            f"Net Profit/Loss: ${self.net:.2f}",
+            f"Profitable Trades: {self.wins} ({percent_profitable:.2f}%)",
+            f"Loss-Making Trades: {self.losses} ({percent_loss:.2f}%)",
+            f"Currency Pairs: {', '.join(map(str, self.pairs)) if self.pair_col else 'N/A'}",
+        ]
+        if 'pair' in breakdown and self.by_pair is not None:
+            # Largest absolute results first, so truncation drops the least significant pairs.
+            by_pair = self.by_pair.reindex(self.by_pair['net'].abs().sort_values(ascending=False).index)
+            lines += self._breakdown_lines(by_pair, "Per-Pair Breakdown", str, max_rows)
+        if 'day' in breakdown and self.by_day is not None:
+            # Most recent days first.
+            by_day = self.by_day[self.by_day.index.notna()].sort_index(ascending=False)
+            lines += self._breakdown_lines(by_day, "Per-Day Breakdown", lambda day: day.strftime('%Y-%m-%d'), max_rows)
+        return '\n'.join(lines)
+
+def csv_metrics_text(df, breakdown=()):
+    """Calculate forex trading metrics for a CSV trading log and return them as text."""
+    return ForexMetrics.from_dataframe(df).text(breakdown)
+
+def chat_completion(prompt, model, final=False):
+    """Send a single-turn prompt to Ollama and return the stripped reply.
+
+    `final` marks the call whose reply is the file's summary. It is streamed, so that
+    time to first token is measured and tokens reach CURRENT_FILE's on_token as they arrive.
+    """
+    metrics = CURRENT_FILE.get()
+    messages = [{'role': 'user', 'content': prompt}]
+    if final:
+        parts = []
+        response = {}
+        for chunk in OLLAMA.chat_stream(model=model, messages=messages):
+            token = chunk['message']['content']
+            if token:
+                parts.append(token)
+                if metrics is not None:
+                    metrics.token(token)
+            if chunk.get('done'):
+                response = chunk
+        content = ''.join(parts)
+    else:
+        response = OLLAMA.chat(model=model, messages=messages)
+        content = response['message']['content']
+
+    RUN_STATS.add_tokens(response.get('eval_count') or 0)
+    if metrics is not None:
+        metrics.add_call(response)
+    return content.strip()
+
+def summarize_metrics(metrics, model='llama3.2'):
+    """Generate a forex-focused summary from precomputed trading metrics text."""
     if not check_ollama_server():
-        print("Error: Ollama server is not running on port 11434. Start it with 'ollama serve &'.")
+        print(server_not_running_message())
         return None
-    
+
     try:
-        # Identify profit/loss column (case-insensitive)
-        profit_col = None
-        for col in df.columns:
-            if col.lower() in ['profit', 'p/l', 'pnl', 'profit/loss']:
-                profit_col = col
-                break
-        if not profit_col:
-            raise ValueError("No 'Profit' or similar column found in CSV.")
-        
-        # Calculate metrics
-        total_trades = len(df)
-        profits = df[profit_col][df[profit_col] > 0]
-        losses = df[profit_col][df[profit_col] < 0]
-        total_profit = profits.sum() if not profits.empty else 0
-        total_loss = losses.sum() if not losses.empty else 0
-        net_profit = df[profit_col].sum()
-        profitable_trades = len(profits)
-        loss_trades = len(losses)
-        percent_profitable = (profitable_trades / total_trades * 100) if total_trades > 0 else 0
-        percent_loss = (loss_trades / total_trades * 100) if total_trades > 0 else 0
-        
-        # Prepare metrics text
-        metrics = (
-            f"Total Trades: {total_trades}\n"
-            f"Total Profit: ${total_profit:.2f}\n"
-            f"Total Loss: ${total_loss:.2f}\n"
-            f"Net Profit/Loss: ${net_profit:.2f}\n"
-            f"Profitable Trades: {profitable_trades} ({percent_profitable:.2f}%)\n"
-            f"Loss-Making Trades: {loss_trades} ({percent_loss:.2f}%)\n"
-            f"Currency Pairs: {', '.join(df['Pair'].unique()) if 'Pair' in df.columns else 'N/A'}"
-        )
-        
         # Send to Ollama for summarization
-        prompt = (
-            "Generate a concise summary of the following forex trading log metrics. "
-            "Include total trades, total profit, total loss, net profit/loss, percentage of profitable and loss-making trades, and mention key currency pairs if available:\n\n"
-            f"{metrics}"
-        )
-        response = ollama.chat(model=model, messages=[
-            {'role': 'user', 'content': prompt}
-        ])
-        return response['message']['content'].strip()
+        return chat_completion(CSV_PROMPT.format(text=metrics), model, final=True)
+    except Exception as e:
+        print(f"Error summarizing CSV: {str(e)}")
+        return None
+
+def summarize_csv(df, model='llama3.2'):
+    """Generate a forex-focused summary for a CSV trading log."""
+    try:
+        metrics = csv_metrics_text(df)
     except Exception as e:
         print(f"Error summarizing CSV: {str(e)}")
         return None
+    return summarize_metrics(metrics, model=model)
 
 def summarize_text(text, model='llama3.2'):
     """Generate a summary of non-CSV text using the specified Ollama model."""
     if not check_ollama_server():
-        print("Error: Ollama server is not running on port 11434. Start it with 'ollama serve &'.")
+        print(server_not_running_message())
         return None
     try:
-        response = ollama.chat(model=model, messages=[
-            {'role': 'user', 'content': f'Summarize this text in a concise paragraph:\n\n{text}'}
-        ])
-        return response['message']['content'].strip()
+        return chat_completion(TEXT_PROMPT.format(text=text), model, final=True)
     except Exception as e:
         print(f"Error summarizing text: {str(e)}")
         return None
 
+def chunk_budget(model, chunk_tokens=None):
+    """Return the chunk token budget for a model, honouring an explicit override."""
+    if chunk_tokens:
+        return chunk_tokens
+    if model in MODEL_CHUNK_TOKENS:
+        return MODEL_CHUNK_TOKENS[model]
+    return MODEL_CHUNK_TOKENS.get(model.split(':')[0], DEFAULT_CHUNK_TOKENS)
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)."""
+    return len(text) // 4 + 1
+
+def _split_oversized(segment, max_tokens):
+    """Split a segment larger than the budget on line breaks, then on whitespace."""
+    max_chars = max_tokens * 4
+    pieces = []
+    for line in segment.splitlines():
+        while len(line) > max_chars:
+            cut = line.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(line[:cut])
+            line = line[cut:].lstrip()
+        if line:
+            pieces.append(line)
+    return pieces
+
+def pack_segments(segments, max_tokens, separator='\n\n'):
+    """Greedily pack text segments (pages, paragraphs) into chunks of at most max_tokens."""
+    current = []
+    current_tokens = 0
+    for segment in segments:
+        segment = segment.strip()
+        if not segment:
+            continue
+        pieces = [segment] if estimate_tokens(segment) <= max_tokens else _split_oversized(segment, max_tokens)
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                yield separator.join(current)
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        yield separator.join(current)
+
+def split_into_chunks(text, max_tokens):
+    """Split text into chunks of at most max_tokens on page and paragraph boundaries."""
+    return list(pack_segments(re.split(r'\f|\n\s*\n', text), max_tokens))
+
+def _summarize_part(part, template, model):
+    """Run one map/reduce prompt, returning None instead of raising on failure."""
+    try:
+        return chat_completion(template.format(text=part), model)
+    except Exception as e:
+        print(f"Error summarizing chunk: {str(e)}")
+        return None
+
+def _summarize_parts(parts, template, model, workers):
+    """Run one prompt per part concurrently and return the replies in order, or None on failure."""
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(parts)))) as pool:
+        futures = [submit_in_context(pool, _summarize_part, part, template, model) for part in parts]
+        replies = [future.result() for future in futures]
+    if any(reply is None for reply in replies):
+        return None
+    return replies
+
+def reduce_summaries(partials, model='llama3.2', chunk_tokens=DEFAULT_CHUNK_TOKENS, workers=1):
+    """Combine partial summaries, in several rounds if they do not fit in one prompt.
+
+    Rounds stop once they no longer reduce the number of partials (each one is already longer
+    than chunk_tokens), and the final prompt then combines the partials as they are.
+    """
+    while len(partials) > 1:
+        groups = list(pack_segments(partials, chunk_tokens))
+        if len(groups) == 1 or len(groups) >= len(partials):
+            break
+        partials = _summarize_parts(groups, REDUCE_PROMPT, model, workers)
+        if partials is None:
+            return None
+    try:
+        return chat_completion(REDUCE_PROMPT.format(text='\n\n'.join(partials)), model, final=True)
+    except Exception as e:
+        print(f"Error combining chunk summaries: {str(e)}")
+        return None
+
+def summarize_text_chunked(text, model='llama3.2', chunk_tokens=DEFAULT_CHUNK_TOKENS, workers=1):
+    """Map-reduce summary: summarize token-budgeted chunks in parallel, then combine the results."""
+    chunks = split_into_chunks(text, chunk_tokens)
+    if len(chunks) <= 1:
+        return summarize_text(text, model=model)
+    if not check_ollama_server():
+        print(server_not_running_message())
+        return None
+
+    partials = _summarize_parts(chunks, CHUNK_PROMPT, model, workers)
+    if partials is None:
+        return None
+    return reduce_summaries(partials, model=model, chunk_tokens=chunk_tokens, workers=workers)
+
+def summarize_pdf_streaming(file_path, model='llama3.2', chunk_tokens=DEFAULT_CHUNK_TOKENS, workers=1):
+    """Map-reduce summary of a PDF that never holds more than a few chunks of its text.
+
+    Pages are packed into chunks as they are extracted and each chunk is submitted as soon as
+    it is full; at most `workers` chunks are waiting on Ollama at any time.
+    """
+    if not check_ollama_server():
+        print(server_not_running_message())
+        return None
+
+    chunks = pack_segments(iter_pdf_pages(file_path), chunk_tokens)
+    try:
+        first = next(chunks, None)
+        if first is None:
+            print(f"Skipping {file_path}: No text content found.")
+            return None
+        second = next(chunks, None)
+        if second is None:
+            return summarize_text(first, model=model)
+
+        partials = []
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for chunk in chain((first, second), chunks):
+                pending.append(submit_in_context(pool, _summarize_part, chunk, CHUNK_PROMPT, model))
+                if len(pending) >= workers:
+                    partials.append(pending.popleft().result())
+            partials.extend(future.result() for future in pending)
+    except Exception as e:
+        print(f"Error reading {file_path}: {str(e)}")
+        return None
+
+    if any(partial_summary is None for partial_summary in partials):
+        return None
+    return reduce_summaries(partials, model=model, chunk_tokens=chunk_tokens, workers=workers)
+
+class SummaryLayout:
+    """Decides where summaries are written.
+
+    By default each summary goes to the current directory as summary_<stem>.txt. With an
+    output directory (used by --recursive), the source tree under `root` is mirrored and the
+    full file name is kept, e.g. docs/a/report.pdf -> <output_dir>/a/summary_report.pdf.txt,
+    so that report.pdf and report.docx in one folder do not overwrite each other's summary.
+    """
+
+    def __init__(self, root='.', output_dir=None):
+        self.root = Path(root)
+        self.output_dir = Path(output_dir) if output_dir else None
+
+    def path_for(self, file_path):
+        if self.output_dir is None:
+            return f"summary_{Path(file_path).stem}.txt"
+        relative = Path(os.path.relpath(file_path, self.root))
+        return str(self.output_dir / relative.parent / f"summary_{relative.name}.txt")
+
+SUMMARY_LAYOUT = SummaryLayout()
+
+def configure_summary_layout(root='.', output_dir=None):
+    """Replace the layout used by summary_path()."""
+    global SUMMARY_LAYOUT
+    SUMMARY_LAYOUT = SummaryLayout(root, output_dir)
+    return SUMMARY_LAYOUT
+
+def parse_packed_summaries(reply, count):
+    """Split a reply to PACKED_PROMPT into `count` summaries, or return None if it is malformed."""
+    sections = re.split(r'^\s*<<<\s*SUMMARY\s+(\d+)\s*>>>\s*$', reply, flags=re.MULTILINE)
+    summaries = {}
+    for number, body in zip(sections[1::2], sections[2::2]):
+        summaries[int(number)] = body.strip()
+    if sorted(summaries) != list(range(1, count + 1)) or not all(summaries.values()):
+        return None
+    return [summaries[n] for n in range(1, count + 1)]
+
+class DocumentPacker:
+    """Packs small text documents into one multi-document prompt (--pack-tokens).
+
+    Documents of at most a quarter of the token budget are collected, in input order, until
+    the budget or PACK_MAX_DOCS is reached; the model is asked for delimited per-document
+    summaries. If its reply cannot be split back into one summary per document, the batch
+    falls back to one summarize() call per document.
+    """
+
+    def __init__(self, pack_tokens, summarize, model='llama3.2', cache=None):
+        self.pack_tokens = pack_tokens
+        self.doc_tokens = pack_tokens // 4
+        self.summarize_one = summarize
+        self.model = model
+        self.cache = cache
+        self.pending = []
+        self.pending_tokens = 0
+
+    def accepts(self, prepared):
+        kind, payload = prepared
+        return kind == 'text' and estimate_tokens(payload) <= self.doc_tokens
+
+    def add(self, key, prepared):
+        """Queue a small document; return a full batch of (key, prepared) to summarize, or None."""
+        tokens = estimate_tokens(prepared[1])
+        batch = None
+        if self.pending and (self.pending_tokens + tokens > self.pack_tokens or len(self.pending) >= PACK_MAX_DOCS):
+            batch = self.flush()
+        self.pending.append((key, prepared))
+        self.pending_tokens += tokens
+        return batch
+
+    def flush(self):
+        """Return (and forget) the documents queued so far."""
+        batch = self.pending
+        self.pending = []
+        self.pending_tokens = 0
+        return batch
+
+    def summarize(self, batch):
+        """Summarize a batch from add()/flush(); returns the summaries in batch order."""
+        texts = [prepared[1] for _, prepared in batch]
+        keys = [SummaryCache.key(text, self.model, PACKED_PROMPT) for text in texts]
+        # Packed-prompt lookups are not counted: a file that misses here is either counted by
+        # summarize_one() on the per-document path or below, once the batch has been summarized.
+        summaries = [self.cache.get(key, count=False) if self.cache is not None else None for key in keys]
+        todo = [i for i, summary in enumerate(summaries) if summary is None]
+        metrics = CURRENT_FILE.get()
+        for i, summary in enumerate(summaries):
+            if summary is not None:
+                self.cache.count(True)
+                if metrics is not None:
+                    metrics.cached_files.add(batch[i][0])
+        if len(todo) == 1:
+            summaries[todo[0]] = self._summarize_single(batch[todo[0]], keys[todo[0]], metrics)
+            return summaries
+        if not todo:
+            return summaries
+
+        if not check_ollama_server():
+            print(server_not_running_message())
+            return summaries
+        documents = '\n\n'.join(f"<<<DOC {n}>>>\n{texts[i]}" for n, i in enumerate(todo, start=1))
+        try:
+            reply = chat_completion(PACKED_PROMPT.format(count=len(todo), text=documents), self.model)
+            replies = parse_packed_summaries(reply, len(todo))
+        except Exception as e:
+            print(f"Error summarizing batch: {str(e)}")
+            replies = None
+
+        if replies is None:
+            print(f"Could not split the batched reply; summarizing {len(todo)} documents one at a time.")
+            for i in todo:
+                summaries[i] = self._summarize_single(batch[i], keys[i], metrics)
+            return summaries
+        for i, summary in zip(todo, replies):
+            summaries[i] = summary
+            if self.cache is not None:
+                self.cache.count(False)
+                self.cache.put(keys[i], summary)
+        return summaries
+
+    def _summarize_single(self, item, packed_key, metrics):
+        """summarize_one() for one document of a batch, marking only that document as cached.
+
+        The summary is also stored under the document's packed key, which is what the next
+        run looks up first, so a document that fell out of its batch is not sent again.
+        """
+        file_key, prepared = item
+        was_cached = metrics.cached if metrics is not None else False
+        summary = self.summarize_one(prepared)
+        if metrics is not None and metrics.cached and not was_cached:
+            metrics.cached = False
+            metrics.cached_files.add(file_key)
+        if summary is not None and self.cache is not None:
+            self.cache.put(packed_key, summary)
+        return summary
+
+def summary_path(file_path):
+    """Name of the summary file for file_path (see SummaryLayout)."""
+    return SUMMARY_LAYOUT.path_for(file_path)
+
+def _matches(relative_path, patterns):
+    """True if a POSIX relative path, or its last component, matches any fnmatch pattern."""
+    name = relative_path.rsplit('/', 1)[-1]
+    return any(fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern)
+               for pattern in patterns)
+
+def crawl_files(root, includes, excludes=(), skip_dirs=()):
+    """Walk a directory tree and return the sorted files matching includes but not excludes.
+
+    Patterns are matched against both the path relative to root and the file name, so
+    '*.pdf' matches at any depth and 'archive/*' matches one folder. Excluded directories
+    and `skip_dirs` (e.g. the output directory) are not descended into.
+    """
+    skip = {os.path.abspath(directory) for directory in skip_dirs}
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        relative_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+        prefix = '' if relative_dir == '.' else relative_dir + '/'
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if os.path.abspath(os.path.join(dirpath, d)) not in skip and not _matches(prefix + d, excludes)
+        )
+        for filename in filenames:
+            relative = prefix + filename
+            if _matches(relative, includes) and not _matches(relative, excludes):
+                files.append(os.path.join(dirpath, filename))
+    return sorted(files)
+
+class SummaryManifest:
+    """Persistent record of summarized files, used to make repeated runs incremental.
+
+    Maps each source file (relative to root) to its size, mtime, SHA-256, summary file and
+    model. A file is summarized again only if it is new, its content changed, the model
+    changed or its summary file is missing; a file whose mtime changed but whose content
+    did not is just re-stamped. Files that were skipped (empty or unreadable) are recorded
+    without a summary and are not read again until they change. The manifest is saved
+    atomically at most every `save_interval` seconds and at the end of the run.
+    """
+
+    def __init__(self, path, root='.', save_interval=30.0):
+        self.path = Path(path)
+        self.root = Path(root)
+        self.save_interval = save_interval
+        self.last_save = time.monotonic()
+        self.dirty = False
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('files', {})
+            except (OSError, ValueError) as e:
+                print(f"Error reading manifest {self.path} (starting a new one): {str(e)}")
+
+    def _key(self, file_path):
+        return Path(os.path.relpath(file_path, self.root)).as_posix()
+
+    def _summary_file(self, entry):
+        """Summary paths are stored relative to the manifest, so runs from any directory agree."""
+        return os.path.normpath(self.path.parent / entry['summary']) if entry.get('summary') else None
+
+    def is_current(self, file_path, model):
+        """True if file_path was already summarized with this model (or skipped) and is unchanged.
+
+        A file that cannot be read, e.g. because it was deleted during the crawl, is not current.
+        """
+        entry = self.entries.get(self._key(file_path))
+        if entry is None:
+            return False
+        if not entry.get('skipped') and (
+                entry.get('model') != model or not os.path.exists(self._summary_file(entry) or '')):
+            return False
+        try:
+            stat = os.stat(file_path)
+            if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                return True
+            if entry['size'] != stat.st_size:
+                return False
+            # Same size, new mtime: touched or copied, possibly unchanged.
+            if file_digest(file_path) != entry['sha256']:
+                return False
+        except OSError:
+            return False
+        entry['mtime_ns'] = stat.st_mtime_ns
+        self.dirty = True
+        return True
+
+    def record(self, file_path, summary_file, model):
+        stat = os.stat(file_path)
+        self.entries[self._key(file_path)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_digest(file_path),
+            'summary': Path(os.path.relpath(summary_file, self.path.parent)).as_posix(),
+            'model': model,
+        }
+        self.dirty = True
+        if time.monotonic() - self.last_save >= self.save_interval:
+            self.save()
+
+    def record_skipped(self, file_path):
+        """Record a file that produced nothing to summarize, so unchanged it is not read again."""
+        try:
+            stat = os.stat(file_path)
+            digest = file_digest(file_path)
+        except OSError:
+            return
+        self.entries[self._key(file_path)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': digest,
+            'summary': None,
+            'skipped': True,
+        }
+        self.dirty = True
+
+    def prune(self):
+        """Delete summaries (and entries) of source files that no longer exist; return their number."""
+        removed = 0
+        for key, entry in list(self.entries.items()):
+            if (self.root / key).exists():
+                continue
+            summary_file = self._summary_file(entry)
+            if summary_file and os.path.exists(summary_file):
+                try:
+                    os.remove(summary_file)
+                    print(f"Removed {summary_file}: source {key} no longer exists.")
+                except OSError as e:
+                    print(f"Error removing {summary_file}: {str(e)}")
+                    continue
+            del self.entries[key]
+            self.dirty = True
+            removed += 1
+        return removed
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'files': self.entries}, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+            self.last_save = time.monotonic()
+        except OSError as e:
+            print(f"Error writing manifest {self.path}: {str(e)}")
+
 def write_summary(file_path, summary):
     """Write the summary to a file named summary_<original_filename>.txt."""
-    base_name = Path(file_path).stem
-    summary_file = f"summary_{base_name}.txt"
+    summary_file = summary_path(file_path)
     try:
+        Path(summary_file).parent.mkdir(parents=True, exist_ok=True)
         with open(summary_file, 'w', encoding='utf-8') as f:
             f.write(summary)
         return summary_file
@@ -216,7 +1413,298 @@ def write_summary(file_path, summary):
         print(f"Error writing summary to {summary_file}: {str(e)}")
         return None
 
+def prepare_file(file_path, stream_pdf=False, csv_breakdown=(), csv_chunk_rows=250_000):
+    """Load a file and return ('csv', metrics) or ('text', text), or None if it should be skipped.
+
+    This is the CPU-bound half of the pipeline and runs in a worker process when --workers > 1.
+    CSVs are reduced to trading metrics in one chunked pass. With stream_pdf, PDFs are not
+    read here; ('pdf', file_path) is returned so that summarize_pdf_streaming can extract
+    them page by page.
+    """
+    if not os.path.exists(file_path):
+        print(f"Skipping {file_path}: File does not exist.")
+        return None
+
+    ext = Path(file_path).suffix.lower()
+    if ext == '.pdf' and stream_pdf:
+        return 'pdf', file_path
+    if ext == '.csv':
+        try:
+            return 'csv', ForexMetrics.from_csv(file_path, chunk_rows=csv_chunk_rows).text(csv_breakdown)
+        except Exception as e:
+            print(f"Error processing CSV {file_path}: {str(e)}")
+            return None
+
+    text = extract_text_from_file(file_path)
+    if text is None or not text.strip():
+        print(f"Skipping {file_path}: No text content found.")
+        return None
+    return 'text', text
+
+def summarize_prepared(prepared, model='llama3.2', cache=None, chunk_tokens=None, workers=1):
+    """Summarize the output of prepare_file with the matching prompt, consulting the cache first.
+
+    A chunk_tokens budget switches text documents to map-reduce summarization.
+    """
+    kind, payload = prepared
+    chunked = kind in ('text', 'pdf') and chunk_tokens is not None
+    if kind == 'csv':
+        template = CSV_PROMPT
+    elif chunked:
+        template = f"chunked:{chunk_tokens}\n{TEXT_PROMPT}\n{CHUNK_PROMPT}\n{REDUCE_PROMPT}"
+    else:
+        template = TEXT_PROMPT
+    key = None
+    if cache is not None:
+        try:
+            # Streamed PDFs are keyed on the file's bytes: their text is not available up front.
+            content = f"pdf-bytes:{file_digest(payload)}" if kind == 'pdf' else payload
+        except OSError as e:
+            print(f"Error reading {payload}: {str(e)}")
+            return None
+        key = SummaryCache.key(content, model, template)
+        summary = cache.get(key)
+        if summary is not None:
+            metrics = CURRENT_FILE.get()
+            if metrics is not None:
+                metrics.cached = True
+            return summary
+
+    if kind == 'csv':
+        summary = summarize_metrics(payload, model=model)
+    elif kind == 'pdf':
+        summary = summarize_pdf_streaming(payload, model=model, chunk_tokens=chunk_tokens, workers=workers)
+    elif chunked:
+        summary = summarize_text_chunked(payload, model=model, chunk_tokens=chunk_tokens, workers=workers)
+    else:
+        summary = summarize_text(payload, model=model)
+
+    if cache is not None and summary is not None:
+        cache.put(key, summary)
+    return summary
+
+class StreamingSummaryWriter:
+    """Prints summary tokens as they arrive and writes them progressively to the summary file.
+
+    Leading and trailing whitespace is held back, so the file ends up identical to the
+    stripped summary that write_summary would have written.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.summary_file = summary_path(file_path)
+        self.file = None
+        self.pending = ''
+
+    @property
+    def started(self):
+        return self.file is not None
+
+    def write(self, token):
+        if not self.started:
+            token = token.lstrip()
+            if not token:
+                return
+            Path(self.summary_file).parent.mkdir(parents=True, exist_ok=True)
+            self.file = open(self.summary_file, 'w', encoding='utf-8')
+            print(f"Summary of {self.file_path}:")
+        text = self.pending + token
+        stripped = text.rstrip()
+        self.pending = text[len(stripped):]
+        if stripped:
+            self.file.write(stripped)
+            self.file.flush()
+            print(stripped, end='', flush=True)
+
+    def close(self, success):
+        """Finish the file, or remove the partial summary of a failed generation."""
+        if not self.started:
+            return
+        self.file.close()
+        print()
+        if not success:
+            try:
+                os.remove(self.summary_file)
+            except OSError:
+                pass
+
+def summarize_with_metrics(summarize, prepared, metrics):
+    """Run summarize(prepared) with metrics as CURRENT_FILE."""
+    token = CURRENT_FILE.set(metrics)
+    try:
+        return summarize(prepared)
+    finally:
+        metrics.finish()
+        CURRENT_FILE.reset(token)
+
+def report_summary(file_path, summary, metrics=None, run_log=None, streamed=False, manifest=None, model=None):
+    """Print a finished summary and save it next to the other summaries.
+
+    When the summary was already streamed to the terminal and its file, only the file name is
+    printed. Saved summaries are recorded in the manifest, if any.
+    """
+    if summary is None:
+        print(f"Skipping {file_path}: Failed to generate summary.")
+        if run_log is not None and metrics is not None:
+            run_log.write(metrics, 'failed', file_path)
+        return
+
+    RUN_STATS.add_file()
+    if run_log is not None and metrics is not None:
+        run_log.write(metrics, 'ok', file_path)
+    if streamed:
+        summary_file = summary_path(file_path)
+    else:
+        print(f"Summary of {file_path}:\n{summary}\n")
+        summary_file = write_summary(file_path, summary)
+    if summary_file:
+        print(f"Summary saved to {summary_file}")
+        if manifest is not None:
+            try:
+                manifest.record(file_path, summary_file, model)
+            except OSError as e:
+                print(f"Error updating manifest for {file_path}: {str(e)}")
+
+def summarize_one(summarize, prepared, file_path):
+    """Summarize one document, returning [(summary, metrics)] like summarize_batch."""
+    metrics = FileMetrics(file_path)
+    return [(summarize_with_metrics(summarize, prepared, metrics), metrics)]
+
+def summarize_batch(packer, batch, file_paths):
+    """Summarize a packed batch, returning (summary, metrics) per document; metrics are shared.
+
+    The batch is keyed by file path here (run_parallel queues documents by input index), so
+    that cached documents are reported by name in the run log.
+    """
+    batch = [(file_path, prepared) for file_path, (_, prepared) in zip(file_paths, batch)]
+    metrics = FileMetrics(file_paths[0])
+    metrics.batch_size = len(batch)
+    summaries = summarize_with_metrics(packer.summarize, batch, metrics)
+    return [(summary, metrics) for summary in summaries]
+
+def run_sequential(files, summarize, prepare=prepare_file, stream=False, run_log=None, manifest=None, model=None,
+                   packer=None):
+    """Extract, summarize and write each file in turn.
+
+    `summarize` is summarize_prepared and `prepare` is prepare_file, with the run's options bound.
+    With stream, summary tokens are printed and written to the summary file as they arrive.
+    Small documents accepted by the packer are summarized (and reported) in batches.
+    """
+    def report_batch(batch):
+        paths = [file_path for file_path, _ in batch]
+        for file_path, (summary, metrics) in zip(paths, summarize_batch(packer, batch, paths)):
+            report_summary(file_path, summary, metrics, run_log, manifest=manifest, model=model)
+
+    for file_path in files:
+        prepared = prepare(file_path)
+        if prepared is None:
+            if manifest is not None:
+                manifest.record_skipped(file_path)
+            continue
+        if packer is not None and packer.accepts(prepared):
+            batch = packer.add(file_path, prepared)
+            if batch:
+                report_batch(batch)
+            continue
+        writer = StreamingSummaryWriter(file_path) if stream else None
+        metrics = FileMetrics(file_path, on_token=writer.write if writer else None)
+        summary = None
+        try:
+            summary = summarize_with_metrics(summarize, prepared, metrics)
+        finally:
+            if writer is not None:
+                writer.close(success=summary is not None)
+        report_summary(file_path, summary, metrics, run_log, streamed=writer is not None and writer.started,
+                       manifest=manifest, model=model)
+
+    if packer is not None:
+        batch = packer.flush()
+        if batch:
+            report_batch(batch)
+
+def run_parallel(files, summarize, workers, extract_workers, prepare=prepare_file, plugins=(), run_log=None,
+                 manifest=None, model=None, packer=None):
+    """Overlap extraction in a process pool with up to `workers` concurrent Ollama calls.
+
+    Results are reported strictly in input order, so the printed output and the
+    summary_<stem>.txt files are the same as those of a sequential run. Small documents
+    accepted by the packer are fed to it in input order, so batches are deterministic too.
+    """
+    skipped = object()
+    outcomes = {}
+    next_to_report = 0
+    next_to_extract = 0
+    # Extracted small documents waiting to be packed, and the next index to consider packing.
+    small = {}
+    extracted = set()
+    next_to_pack = 0
+    # Cap the number of extracted-but-unsummarized documents held in memory.
+    max_ahead = workers * 2
+
+    with ProcessPoolExecutor(max_workers=extract_workers, initializer=load_plugins,
+                             initargs=(tuple(plugins),)) as extract_pool, \
+            ThreadPoolExecutor(max_workers=workers) as llm_pool:
+        extracting = {}
+        summarizing = {}
+
+        while next_to_report < len(files):
+            while (next_to_extract < len(files)
+                   and len(extracting) + len(summarizing) < max_ahead + extract_workers):
+                future = extract_pool.submit(prepare, files[next_to_extract])
+                extracting[future] = next_to_extract
+                next_to_extract += 1
+
+            done, _ = wait(set(extracting) | set(summarizing), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in extracting:
+                    index = extracting.pop(future)
+                    try:
+                        prepared = future.result()
+                    except Exception as e:
+                        print(f"Error reading {files[index]}: {str(e)}")
+                        prepared = None
+                    if packer is not None:
+                        extracted.add(index)
+                    if prepared is None:
+                        outcomes[index] = skipped
+                    elif packer is not None and packer.accepts(prepared):
+                        small[index] = prepared
+                    else:
+                        future = llm_pool.submit(summarize_one, summarize, prepared, files[index])
+                        summarizing[future] = [index]
+                else:
+                    for index, outcome in zip(summarizing.pop(future), future.result()):
+                        outcomes[index] = outcome
+
+            if packer is not None:
+                batches = []
+                while next_to_pack in extracted:
+                    extracted.discard(next_to_pack)
+                    if next_to_pack in small:
+                        batch = packer.add(next_to_pack, small.pop(next_to_pack))
+                        if batch:
+                            batches.append(batch)
+                    next_to_pack += 1
+                if next_to_pack == len(files):
+                    batches.append(packer.flush())
+                for batch in filter(None, batches):
+                    indexes = [index for index, _ in batch]
+                    future = llm_pool.submit(summarize_batch, packer, batch, [files[i] for i in indexes])
+                    summarizing[future] = indexes
+
+            while next_to_report in outcomes:
+                outcome = outcomes.pop(next_to_report)
+                if outcome is skipped:
+                    if manifest is not None:
+                        manifest.record_skipped(files[next_to_report])
+                else:
+                    summary, metrics = outcome
+                    report_summary(files[next_to_report], summary, metrics, run_log,
+                                   manifest=manifest, model=model)
+                next_to_report += 1
+
 def main():
+    main_start = time.perf_counter()
     parser = argparse.ArgumentParser(
         description="Summarize text documents or forex trading CSVs in the current directory using Ollama.",
         formatter_class=argparse.RawTextHelpFormatter
@@ -233,6 +1721,158 @@ def main():
         default='llama3.2', 
         help="Ollama model to use for summarization (default: llama3.2)."
     )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help="Number of concurrent Ollama requests (default: 1, sequential).\n"
+             "Match this to the server's OLLAMA_NUM_PARALLEL setting."
+    )
+    parser.add_argument(
+        '--extract-workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes used for text extraction when --workers > 1 (default: CPU count)."
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directory of the persistent summary cache (default: {DEFAULT_CACHE_DIR})."
+    )
+    parser.add_argument(
+        '--cache-max-mb',
+        type=float,
+        default=512,
+        help="Size limit of the summary cache in MB; least recently used entries are evicted (default: 512)."
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help="Do not read or write the summary cache."
+    )
+    parser.add_argument(
+        '--chunked',
+        action='store_true',
+        help="Summarize long documents map-reduce style: chunks in parallel, then a combining pass."
+    )
+    parser.add_argument(
+        '--chunk-tokens',
+        type=int,
+        help=f"Token budget per chunk in --chunked mode (default: per-model, {DEFAULT_CHUNK_TOKENS} for unlisted models)."
+    )
+    parser.add_argument(
+        '--host',
+        default='localhost',
+        help="Host name of the Ollama server (default: localhost)."
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=11434,
+        help="Port of the Ollama server (default: 11434)."
+    )
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=300.0,
+        help="Seconds to wait for an Ollama response (default: 300)."
+    )
+    parser.add_argument(
+        '--connect-timeout',
+        type=float,
+        default=5.0,
+        help="Seconds to wait when connecting to the Ollama server (default: 5)."
+    )
+    parser.add_argument(
+        '--health-ttl',
+        type=float,
+        default=30.0,
+        help="Seconds a successful server health check is trusted before re-checking (default: 30)."
+    )
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=5,
+        help="Retries, with exponential backoff, while the server is down or a request fails transiently (default: 5)."
+    )
+    parser.add_argument(
+        '-r', '--recursive',
+        action='store_true',
+        help="Crawl the --root directory tree instead of globbing the current directory.\n"
+             "Runs are incremental: a manifest records what was summarized, and only new or\n"
+             "changed files are processed."
+    )
+    parser.add_argument(
+        '--root',
+        default='.',
+        help="Directory tree crawled with --recursive (default: current directory)."
+    )
+    parser.add_argument(
+        '--include',
+        action='append',
+        default=[],
+        help="Pattern of files to include with --recursive, e.g. '*.pdf' (repeatable; default: the pattern argument)."
+    )
+    parser.add_argument(
+        '--exclude',
+        action='append',
+        default=[],
+        help="Pattern of files or directories to skip with --recursive, e.g. 'archive' or '*.tmp.txt' (repeatable)."
+    )
+    parser.add_argument(
+        '--output-dir',
+        help="Directory that mirrors the --root tree and receives the summaries with --recursive\n"
+             "(default: <root>/summaries)."
+    )
+    parser.add_argument(
+        '--manifest',
+        help="Manifest file of a --recursive run (default: <output-dir>/.summary_manifest.json)."
+    )
+    parser.add_argument(
+        '--prune',
+        action='store_true',
+        help="With --recursive, delete summaries whose source files no longer exist."
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help="Print summary tokens as they arrive and write them progressively to the summary file.\n"
+             "Files are then processed one at a time; --workers only parallelizes --chunked chunks."
+    )
+    parser.add_argument(
+        '--run-log',
+        help="Append one JSON line per file with time to first token, total time and tokens/s."
+    )
+    parser.add_argument(
+        '--plugin',
+        action='append',
+        default=[],
+        help="Python module or .py file that registers extra extractors with register_extractor() (repeatable)."
+    )
+    parser.add_argument(
+        '--profile-startup',
+        action='store_true',
+        help="Report how long each extractor's imports took."
+    )
+    parser.add_argument(
+        '--pack-tokens',
+        type=int,
+        default=0,
+        help="Summarize small text documents (at most a quarter of this many tokens) several at a time,\n"
+             "in one prompt of up to this many tokens (default: 0, disabled). Example: --pack-tokens 4000"
+    )
+    parser.add_argument(
+        '--csv-breakdown',
+        choices=['none', 'pair', 'day', 'all'],
+        default='none',
+        help="Add per-pair and/or per-day aggregates of CSV trading logs to the prompt (default: none)."
+    )
+    parser.add_argument(
+        '--csv-chunk-rows',
+        type=int,
+        default=250_000,
+        help="Rows read per chunk when computing CSV metrics (default: 250000)."
+    )
 
     try:
         args = parser.parse_args()
@@ -240,44 +1880,81 @@ def main():
         print(f"Error parsing arguments: {str(e)}")
         sys.exit(1)
 
-    if not args.pattern.startswith('*') and not os.path.exists(args.pattern):
-        print(f"Error: File '{args.pattern}' does not exist in {os.getcwd()}")
+    if args.workers < 1 or args.extract_workers < 1:
+        print("Error: --workers and --extract-workers must be at least 1.")
         sys.exit(1)
 
-    files = glob.glob(args.pattern)
-    if not files:
-        print(f"No files found matching pattern '{args.pattern}' in the current directory.")
+    try:
+        load_plugins(args.plugin)
+    except Exception as e:
+        print(f"Error loading plugin: {str(e)}")
         sys.exit(1)
 
-    for file_path in files:
-        if not os.path.exists(file_path):
-            print(f"Skipping {file_path}: File does not exist.")
-            continue
+    manifest = None
+    if args.recursive:
+        if not os.path.isdir(args.root):
+            print(f"Error: Directory '{args.root}' does not exist.")
+            sys.exit(1)
+        output_dir = args.output_dir or os.path.join(args.root, 'summaries')
+        configure_summary_layout(args.root, output_dir)
+        manifest = SummaryManifest(args.manifest or os.path.join(output_dir, '.summary_manifest.json'), args.root)
+        if args.prune:
+            print(f"Pruned {manifest.prune()} summary(ies) of deleted files.")
 
-        ext = Path(file_path).suffix.lower()
-        if ext == '.csv':
-            try:
-                df = pd.read_csv(file_path)
-                summary = summarize_csv(df, model=args.model)
-            except Exception as e:
-                print(f"Error processing CSV {file_path}: {str(e)}")
-                continue
-        else:
-            text = extract_text_from_file(file_path)
-            if text is None or not text.strip():
-                print(f"Skipping {file_path}: No text content found.")
-                continue
-            summary = summarize_text(text, model=args.model)
+        files = crawl_files(args.root, args.include or [args.pattern], args.exclude, skip_dirs=[output_dir])
+        unchanged = [file_path for file_path in files if manifest.is_current(file_path, args.model)]
+        if unchanged:
+            skip = set(unchanged)
+            files = [file_path for file_path in files if file_path not in skip]
+            print(f"{len(unchanged)} unchanged file(s) already summarized or skipped (see {manifest.path}).")
+        if not files:
+            manifest.save()
+            print(f"No new or modified files matching {args.include or [args.pattern]} under {args.root}.")
+            sys.exit(0)
+    else:
+        if not args.pattern.startswith('*') and not os.path.exists(args.pattern):
+            print(f"Error: File '{args.pattern}' does not exist in {os.getcwd()}")
+            sys.exit(1)
 
-        if summary is None:
-            print(f"Skipping {file_path}: Failed to generate summary.")
-            continue
+        files = sorted(glob.glob(args.pattern))
+        if not files:
+            print(f"No files found matching pattern '{args.pattern}' in the current directory.")
+            sys.exit(1)
 
-        print(f"Summary of {file_path}:\n{summary}\n")
+    cache = None
+    if not args.no_cache:
+        cache = SummaryCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024))
 
-        summary_file = write_summary(file_path, summary)
-        if summary_file:
-            print(f"Summary saved to {summary_file}")
+    chunk_tokens = chunk_budget(args.model, args.chunk_tokens) if args.chunked else None
+    summarize = partial(summarize_prepared, model=args.model, cache=cache,
+                        chunk_tokens=chunk_tokens, workers=args.workers)
+    csv_breakdown = {'none': (), 'pair': ('pair',), 'day': ('day',), 'all': ('pair', 'day')}[args.csv_breakdown]
+    prepare = partial(prepare_file, stream_pdf=args.chunked, csv_breakdown=csv_breakdown,
+                      csv_chunk_rows=args.csv_chunk_rows)
+    configure_ollama(host=args.host, port=args.port, timeout=args.timeout,
+                     connect_timeout=args.connect_timeout, health_ttl=args.health_ttl,
+                     retries=args.retries, concurrency=args.workers)
+
+    run_log = RunLog(args.run_log, args.model) if args.run_log else None
+    packer = DocumentPacker(args.pack_tokens, summarize, model=args.model, cache=cache) if args.pack_tokens > 0 else None
+
+    try:
+        if args.workers > 1 and len(files) > 1 and not args.stream:
+            run_parallel(files, summarize, args.workers, min(args.extract_workers, len(files)),
+                         prepare=prepare, plugins=args.plugin, run_log=run_log,
+                         manifest=manifest, model=args.model, packer=packer)
+        else:
+            run_sequential(files, summarize, prepare=prepare, stream=args.stream, run_log=run_log,
+                           manifest=manifest, model=args.model, packer=packer)
+    finally:
+        if manifest is not None:
+            manifest.save()
+
+    print(RUN_STATS.report())
+    if cache is not None:
+        print(cache.report())
+    if args.profile_startup:
+        print(startup_report(main_start))
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts are standalone files rather than a package; make them importable by name.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
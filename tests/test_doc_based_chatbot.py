@@ -0,0 +1,35 @@
+import numpy as np
+
+import doc_based_chatbot as chatbot
+
+
+def test_cache_reuses_a_precomputed_question_embedding(tmp_path, monkeypatch):
+    calls = []
+
+    def embed(texts, model):
+        calls.append(texts)
+        return np.ones((len(texts), 4), dtype=np.float32) / 2
+
+    monkeypatch.setattr(chatbot.EmbeddingIndex, 'embed', staticmethod(embed))
+    doc = tmp_path / 'policy.txt'
+    doc.write_text('Refunds within 30 days.')
+    cache = chatbot.AnswerCache(str(tmp_path / 'answers.db'), [str(doc)], embed_model='nomic-embed-text',
+                                similarity=0.9)
+    cache.put('How long do refunds take?', '30 days.')
+    calls.clear()
+
+    # The console loop embeds each question once and passes it to both get() and put()
+    embedding = cache.embed_question('What is the refund window?')
+    assert cache.get('What is the refund window?', embedding) == '30 days.'
+    cache.put('What is the refund window?', '30 days.', embedding)
+    assert len(calls) == 1
+    cache.close()
+
+
+def test_serialize_rows_formats_each_column_with_its_own_dtype():
+    # Unlike iterrows, integer columns are not upcast to float next to a float column
+    df = chatbot.pd.DataFrame({'id': [1, 2], 'price': [1.5, None], 'name': ['mug', None]})
+    assert chatbot.serialize_rows(df) == ("Row 1: id: 1, price: 1.5, name: mug\n"
+                                          "Row 2: id: 2, price: nan, name: nan")
+    assert chatbot.serialize_rows(df.iloc[1:], first_row=101) == "Row 101: id: 2, price: nan, name: nan"
+    assert chatbot.serialize_rows(df.iloc[:0]) == ""
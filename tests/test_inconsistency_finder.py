@@ -0,0 +1,57 @@
+import inconsistency_finder as finder
+from inconsistency_finder import Quantity
+
+
+def test_lowercase_month_word_is_a_date_only_with_a_year():
+    assert finder.extract_quantities('Customers may 2 items return') == {Quantity('count', 2.0, 'item')}
+    assert all(q.kind != 'date' for q in finder.extract_quantities('we may 2x the budget'))
+    assert finder.extract_quantities('Refunds from May 2') == {Quantity('date', '05-02', '')}
+    assert finder.extract_quantities('refunds from may 2, 2024') == {Quantity('date', '2024-05-02', '')}
+    assert finder.extract_quantities('the may 2024 policy') == {Quantity('date', '2024-05', '')}
+
+
+def test_ranges_are_one_quantity_with_the_shared_unit():
+    thirty_to_sixty_days = {Quantity('duration', (30.0, 60.0), 'day')}
+    assert finder.extract_quantities('Returns within 30-60 days') == thirty_to_sixty_days
+    assert finder.extract_quantities('Returns within thirty to sixty days') == thirty_to_sixty_days
+    assert finder.extract_quantities('Returns within 1-2 weeks') == {Quantity('duration', (7.0, 14.0), 'day')}
+    assert finder.extract_quantities('A fee of $5-10') == {Quantity('amount', (5.0, 10.0), 'USD')}
+    assert finder.extract_quantities('A 30-day window') == {Quantity('duration', 30.0, 'day')}
+
+
+def test_topic_matcher_reports_nested_keywords():
+    matcher = finder.TopicMatcher({'returns': ['return'], 'return policy': ['return policy'], 'policy': ['policy']})
+    assert matcher.tags('Our return policy allows 30 days') == ['returns', 'return policy', 'policy']
+
+
+def test_read_pdf_file_with_pages_without_close(monkeypatch):
+    import sys
+    import types
+
+    class Page:
+        # A pdfplumber < 0.11 page: flush_cache() but no close()
+        def __init__(self, text):
+            self.text = text
+            self.flushed = False
+
+        def extract_text(self):
+            return self.text
+
+        def flush_cache(self):
+            self.flushed = True
+
+    pages = [Page('Return policy: 30 days.\n'), Page('Refunds in 5 days.')]
+
+    class PDF:
+        def __init__(self):
+            self.pages = pages
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setitem(sys.modules, 'pdfplumber', types.SimpleNamespace(open=lambda path: PDF()))
+    assert finder.read_pdf_file('old.pdf') == [('Return policy: 30 days.', 1), ('Refunds in 5 days.', 2)]
+    assert all(page.flushed for page in pages)
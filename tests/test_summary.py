@@ -0,0 +1,115 @@
+import summary
+
+
+def test_reduce_stops_when_partials_exceed_the_budget(monkeypatch):
+    # Every reply is longer than chunk_tokens, so no reduce round can shrink the list
+    calls = []
+
+    def fake_chat_completion(prompt, model, final=False):
+        calls.append(final)
+        return 'word ' * 200
+
+    monkeypatch.setattr(summary, 'chat_completion', fake_chat_completion)
+    result = summary.reduce_summaries(['partial ' * 100] * 4, chunk_tokens=60)
+    assert result == ('word ' * 200)
+    assert calls[-1] is True
+    assert len(calls) < 20
+
+
+def test_reduce_combines_short_partials_in_one_prompt(monkeypatch):
+    prompts = []
+
+    def fake_chat_completion(prompt, model, final=False):
+        prompts.append(prompt)
+        return 'combined'
+
+    monkeypatch.setattr(summary, 'chat_completion', fake_chat_completion)
+    assert summary.reduce_summaries(['one', 'two', 'three'], chunk_tokens=1000) == 'combined'
+    assert len(prompts) == 1 and 'one\n\ntwo\n\nthree' in prompts[0]
+
+
+def test_dead_connection_reprobes_after_health_ttl(monkeypatch):
+    connection = summary.OllamaConnection(retries=2, backoff=0.01, health_ttl=0.05)
+    server = {'up': False, 'probes': 0}
+
+    def fake_is_running():
+        server['probes'] += 1
+        return server['up']
+
+    monkeypatch.setattr(connection, 'is_running', fake_is_running)
+    assert connection.wait_until_running() is False
+    assert server['probes'] == 3
+    # Within health_ttl the dead connection fails without probing
+    assert connection.wait_until_running() is False
+    assert server['probes'] == 3
+    # After it, a single probe revives the connection once the server is back
+    server['up'] = True
+    summary.time.sleep(0.06)
+    assert connection.wait_until_running() is True
+    assert server['probes'] == 4
+    assert connection.dead_until is None
+
+
+def test_manifest_records_skipped_files_and_tolerates_deleted_ones(tmp_path):
+    empty = tmp_path / 'empty.txt'
+    empty.write_text('')
+    gone = tmp_path / 'gone.txt'
+    gone.write_text('some text')
+    manifest = summary.SummaryManifest(tmp_path / 'manifest.json', root=tmp_path)
+    manifest.record(str(gone), str(tmp_path / 'summary_gone.txt'), 'llama3.2')
+    (tmp_path / 'summary_gone.txt').write_text('summary')
+
+    summary.run_sequential([str(empty)], summarize=None, prepare=lambda path: None, manifest=manifest)
+    manifest.save()
+    reloaded = summary.SummaryManifest(tmp_path / 'manifest.json', root=tmp_path)
+    assert reloaded.is_current(str(empty), 'llama3.2')
+    assert reloaded.is_current(str(gone), 'llama3.2')
+
+    gone.unlink()
+    assert not reloaded.is_current(str(gone), 'llama3.2')
+    empty.write_text('now with content')
+    assert not reloaded.is_current(str(empty), 'llama3.2')
+
+
+def test_parallel_run_logs_cached_packed_files(tmp_path, monkeypatch):
+    import json
+
+    texts = {f'note{n}.txt': f'Short note number {n} about returns.' for n in range(3)}
+    files = []
+    for name, text in texts.items():
+        (tmp_path / name).write_text(text)
+        files.append(str(tmp_path / name))
+    cache = summary.SummaryCache(tmp_path / 'cache')
+    for text in texts.values():
+        cache.put(summary.SummaryCache.key(text, 'llama3.2', summary.PACKED_PROMPT), 'cached summary')
+    monkeypatch.setattr(summary, 'SUMMARY_LAYOUT', summary.SummaryLayout(tmp_path, tmp_path / 'out'))
+
+    packer = summary.DocumentPacker(4000, summarize=None, cache=cache)
+    run_log = summary.RunLog(str(tmp_path / 'run.jsonl'), 'llama3.2')
+    summary.run_parallel(files, summarize=None, workers=2, extract_workers=1, run_log=run_log, packer=packer)
+
+    records = [json.loads(line) for line in (tmp_path / 'run.jsonl').read_text().splitlines()]
+    assert [record['file'] for record in records] == files
+    assert all(record['status'] == 'cached' for record in records)
+    assert (cache.hits, cache.misses) == (3, 0)
+
+
+def test_packed_fallback_summaries_are_cached_for_the_next_run(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_chat_completion(prompt, model, final=False):
+        calls.append(prompt)
+        return 'not a delimited reply'
+
+    monkeypatch.setattr(summary, 'chat_completion', fake_chat_completion)
+    monkeypatch.setattr(summary, 'check_ollama_server', lambda: True)
+    cache = summary.SummaryCache(tmp_path / 'cache')
+    summarize = lambda prepared: summary.summarize_prepared(prepared, cache=cache)
+    batch = [(f'note{n}.txt', ('text', f'Short note number {n}.')) for n in range(3)]
+
+    first = summary.DocumentPacker(4000, summarize, cache=cache).summarize(batch)
+    assert first == ['not a delimited reply'] * 3
+    calls.clear()
+    second = summary.DocumentPacker(4000, summarize, cache=cache).summarize(batch)
+    assert second == first
+    assert calls == []